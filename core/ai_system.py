@@ -1,64 +1,425 @@
 import os
 import json
+import time
+import zlib
+import datetime
+import unicodedata
+import numpy as np
 import google.generativeai as genai
 from dotenv import load_dotenv
 from core.config import CONFIG_JUDGE_FINE_TUNING
+from core.ocr_layout import load_layout, relevant_text
+from core.response_cache import ResponseCache
+from core.conversation_memory import ConversationMemory, is_followup
+from core.page_index import PageLibrary
 
 load_dotenv()
 
+
+class NeedsBookClassifier:
+    """질문에 책 내용이 필요한지 판단하는 로컬 분류기 (문자 n-gram 해시 특징 + 로지스틱 회귀)
+
+    예시가 적어 확신도가 낮을 수 있으므로 predict()는 확률을 돌려주고, 판단이 애매하면 호출 측에서 LLM을 사용한다.
+    observe()로 LLM 판단을 배울 때마다 학습 전 예측이 확신 구간에서 LLM과 일치했는지 세어 두어
+    (labelled, checked, agreed) 호출 측이 로컬 판단을 믿어도 되는지 확인할 수 있다.
+    """
+    def __init__(self, ngram_range=(1, 3), dim=1 << 14, l2=1e-3, epochs=300, lr=2.0, update_steps=10):
+        self.ngram_range = ngram_range
+        self.dim = dim
+        self.l2 = l2
+        self.epochs = epochs
+        self.lr = lr
+        self.update_steps = update_steps
+        self.samples = []
+        self.labelled = 0
+        self.checked = 0
+        self.agreed = 0
+        # (가중치, 편향)을 한 번에 교체해 predict()가 학습 중간 상태를 읽지 않도록 함
+        self._model = (np.zeros(dim, dtype=np.float64), 0.0)
+
+    def features(self, text):
+        """중복 없는 n-gram 해시 인덱스 (값은 모두 1, 길이로 정규화)"""
+        text = " " + " ".join(unicodedata.normalize('NFKC', text or "").lower().split()) + " "
+        lo, hi = self.ngram_range
+        grams = {text[i:i + n] for n in range(lo, hi + 1) for i in range(len(text) - n + 1)}
+        return np.fromiter({zlib.crc32(g.encode('utf-8')) % self.dim for g in grams}, dtype=np.int64)
+
+    def fit(self, samples):
+        """samples: (질문, bool) 목록으로 처음부터 다시 학습"""
+        self.samples = list(samples)
+        if not self.samples or len({label for _, label in self.samples}) < 2:
+            return self
+        rows = [self.features(question) for question, _ in self.samples]
+        # 실제로 등장한 특징 열만 모아 작은 밀집 행렬로 학습 (예시가 수백 개 수준이라 전체 배치 경사하강으로 충분)
+        used = np.unique(np.concatenate(rows))
+        Xu = np.zeros((len(rows), len(used)), dtype=np.float64)
+        for row, idx in enumerate(rows):
+            if len(idx):
+                Xu[row, np.searchsorted(used, idx)] = 1.0 / np.sqrt(len(idx))
+        y = np.array([1.0 if label else 0.0 for _, label in self.samples])
+        w, b = np.zeros(len(used)), 0.0
+        for _ in range(self.epochs):
+            p = 1.0 / (1.0 + np.exp(-(Xu @ w + b)))
+            grad = p - y
+            w -= self.lr * (Xu.T @ grad / len(y) + self.l2 * w)
+            b -= self.lr * grad.mean()
+        weights = np.zeros(self.dim, dtype=np.float64)
+        weights[used] = w
+        self._model = (weights, b)
+        return self
+
+    def add(self, question, label):
+        """새 예시 하나로 기존 가중치를 몇 단계 SGD 갱신 (전체 재학습 없이 수십 마이크로초)"""
+        self.samples.append((question, label))
+        idx = self.features(question)
+        if len(idx) == 0:
+            return self
+        weights, b = self._model
+        w = weights[idx]
+        x, y = 1.0 / np.sqrt(len(idx)), 1.0 if label else 0.0
+        for _ in range(self.update_steps):
+            grad = 1.0 / (1.0 + np.exp(-(w.sum() * x + b))) - y
+            w = w - self.lr * (grad * x + self.l2 * w)
+            b -= self.lr * grad
+        weights = weights.copy()
+        weights[idx] = w
+        self._model = (weights, b)
+        return self
+
+    def observe(self, question, label, confidence=0.8):
+        """LLM이 판단한 예시를 배우기 전에, 확신 구간(confidence 이상/1 - confidence 이하) 예측이 맞았는지 기록"""
+        p = self.predict(question)
+        self.labelled += 1
+        if p >= confidence or p <= 1 - confidence:
+            self.checked += 1
+            self.agreed += (p >= 0.5) == bool(label)
+        return self.add(question, label)
+
+    def accuracy(self):
+        """확신 구간 예측의 LLM 일치율 (확인한 예시가 없으면 0)"""
+        return self.agreed / self.checked if self.checked else 0.0
+
+    def predict(self, question):
+        """책 내용이 필요할 확률"""
+        idx = self.features(question)
+        if len(idx) == 0:
+            return 0.5
+        weights, b = self._model
+        z = weights[idx].sum() / np.sqrt(len(idx)) + b
+        return float(1.0 / (1.0 + np.exp(-z)))
+
+
+def harvest_judge_samples(record_path="conversation/record.json", limit=500):
+    """대화 기록에서 최근 limit개의 (질문, 책 필요 여부) 예시 수집
+
+    로컬 분류기가 스스로 내린 판단을 다시 배우면 실수가 굳어지므로 LLM이 판단한 기록(judge_source == 'llm')만 사용한다.
+    시작 시 전체 배치 학습 시간이 기록 크기에 비례하므로 최근 예시만 사용한다.
+    """
+    try:
+        with open(record_path, 'r', encoding='utf-8') as f:
+            records = json.load(f).get("records", [])
+    except (OSError, ValueError):
+        return []
+    samples = []
+    for record in records:
+        question = record.get("user_prompt")
+        response = record.get("ai_response") or ""
+        if not question or response.startswith("[AI 오류") or record.get("judge_source") != "llm":
+            continue
+        if isinstance(record.get("needs_book"), bool):
+            samples.append((question, record["needs_book"]))
+    return samples[-limit:] if limit else samples
+
+
 class AISystem:
-    def __init__(self):
+    MODEL_NAME = 'gemini-1.5-flash'
+    # 컨텍스트 캐시는 버전이 고정된 모델과 최소 토큰 수 이상의 내용에만 사용할 수 있음
+    CACHE_MODEL_NAME = 'models/gemini-1.5-flash-001'
+    CONTEXT_CACHE_MIN_TOKENS = 32768
+    JUDGE_INSTRUCTION = "사용자의 질문에 답하기 위해 책의 내용이 필요하면 'True', 필요하지 않으면 'False'를 출력하세요. 오직 'True' 또는 'False'만 출력해야 합니다."
+
+    def __init__(self, use_cache=True, local_judge=True, judge_confidence=0.8, judge_context_cache=False, memory_tokens=600,
+                 book_id=None, retrieval_k=4, judge_min_samples=50, judge_min_accuracy=0.95):
         self.system_instruction = "당신은 독서를 돕는 AI입니다. 상대의 질문에 정성스럽게 대답하세요. 그리고 구체적이고 논리적인 설명이 좋습니다. 하지만 너무 길게 말하지는 마세요."
         try:
             self.gemini_api_key = os.getenv("GEMINI_API_KEY")
             genai.configure(api_key=self.gemini_api_key)
             
-            self.model = genai.GenerativeModel('gemini-1.5-flash', system_instruction=self.system_instruction)
+            self.model = genai.GenerativeModel(self.MODEL_NAME, system_instruction=self.system_instruction)
         except Exception as e:
             print(f"Gemini API 초기화 오류: {e}")
             self.model = None
 
         self.judge_fine_tuning = CONFIG_JUDGE_FINE_TUNING
-        
+        self._init_judge_model(judge_context_cache)
+
+        # 로컬 분류기가 확신할 때(확률이 judge_confidence 이상 또는 1 - judge_confidence 이하)는 LLM 판단을 생략
+        self.judge_confidence = judge_confidence
+        # LLM 판단 예시가 judge_min_samples개 이상 쌓이고, 그동안 확신한 예측의 LLM 일치율이 judge_min_accuracy 이상일 때만 로컬 판단을 사용
+        self.judge_min_samples = judge_min_samples
+        self.judge_min_accuracy = judge_min_accuracy
+        self.judge_stats = {'local': 0, 'llm': 0, 'llm_ms': 0.0, 'prompt_tokens': 0, 'cached_tokens': 0}
+        # 마지막 judge_question()의 판단 주체 ('local', 'llm', 판단 실패면 None), 대화 기록에 남겨 학습 예시를 고름
+        self.last_judge_source = None
+        self.judge_classifier = None
+        if local_judge:
+            base = [(q, a == "True") for q, a in self.judge_fine_tuning]
+            harvested = harvest_judge_samples()
+            classifier = NeedsBookClassifier().fit(base)
+            # 기록 순서대로 예측 후 학습을 반복해, 실행 중과 같은 방식으로 로컬 판단의 일치율을 잼
+            for question, label in harvested:
+                classifier.observe(question, label, judge_confidence)
+            self.judge_classifier = classifier.fit(base + harvested)
+            print(f"로컬 질문 분류기 학습 완료 (예시 {len(base) + len(harvested)}개, "
+                  f"LLM 일치율 {classifier.accuracy():.0%} / 확인 {classifier.checked}개, 사용 {'가능' if self._judge_trusted() else '보류'})")
+
+        # 후속 질문을 위해 이전 대화와 페이지 요약을 토큰 예산 안에서 프롬프트에 포함 (0이면 사용 안 함)
+        self.memory = ConversationMemory(token_budget=memory_tokens) if memory_tokens > 0 else None
+
+        # 캡처한 페이지를 책(book_id)별로 색인해 질문과 관련된 조각 retrieval_k개만 프롬프트에 넣음 (0이면 사용 안 함)
+        # book_id를 주지 않으면 프로그램 실행 한 번을 한 권으로 봄
+        self.book_id = book_id or datetime.datetime.now().strftime("session_%Y%m%d_%H%M%S")
+        self.retrieval_k = retrieval_k
+        self.library = PageLibrary() if retrieval_k > 0 else None
+
+        # 같은 페이지에 대한 같은 질문(수업 중 반복 질문)은 Gemini를 다시 부르지 않음
+        self.response_cache = None
+        if use_cache:
+            try:
+                self.response_cache = ResponseCache(namespace=f"{self.MODEL_NAME}\x00{self.system_instruction}")
+            except Exception as e:
+                print(f"응답 캐시 초기화 오류: {e}")
+
+    def _init_judge_model(self, context_cache=False):
+        """질문 판단용 모델을 한 번만 준비: 예시 대화(few-shot)는 미리 만들어 두고 매 호출에 그대로 재사용
+
+        context_cache=True이고 예시가 컨텍스트 캐시 최소 크기 이상이면 서버 측 캐시에 올려 질문만 전송한다.
+        """
+        self.judge_history = []
+        for q, a in self.judge_fine_tuning:
+            self.judge_history.append({'role': 'user', 'parts': [q]})
+            self.judge_history.append({'role': 'model', 'parts': [a]})
+        self.judge_model, self.judge_cache = None, None
+        if not self.model:
+            return
+        # 'True'/'False'만 받으면 되므로 출력 길이를 제한하고 결정적으로 생성
+        config = {'temperature': 0, 'max_output_tokens': 4}
+        try:
+            self.judge_model = genai.GenerativeModel(self.MODEL_NAME, system_instruction=self.JUDGE_INSTRUCTION,
+                                                     generation_config=config)
+            if context_cache:
+                tokens = self.judge_model.count_tokens(self.judge_history).total_tokens
+                if tokens >= self.CONTEXT_CACHE_MIN_TOKENS:
+                    self.judge_cache = genai.caching.CachedContent.create(
+                        model=self.CACHE_MODEL_NAME, system_instruction=self.JUDGE_INSTRUCTION,
+                        contents=self.judge_history, ttl=datetime.timedelta(hours=1))
+                    self.judge_model = genai.GenerativeModel.from_cached_content(self.judge_cache, generation_config=config)
+                    print(f"판단 예시 {tokens}토큰을 컨텍스트 캐시에 저장")
+                else:
+                    print(f"판단 예시가 {tokens}토큰으로 컨텍스트 캐시 최소 크기보다 작아 로컬에서 재사용")
+        except Exception as e:
+            print(f"판단 모델 초기화 오류: {e}")
+            self.judge_cache = None
 
-    def _AI(self, prompt, fine_tuning=None):
+    def _AI(self, prompt):
         if not self.model:
             return "AI 모델을 사용할 수 없습니다."
         
         try:
-            if fine_tuning:
-                chat_history = []
-                for q, a in fine_tuning:
-                    chat_history.append({'role': 'user', 'parts': [q]})
-                    chat_history.append({'role': 'model', 'parts': [a]})
-                
-                chat = self.model.start_chat(history=chat_history)
-                response = chat.send_message(prompt)
-            else:
-                response = self.model.generate_content(prompt)
-
+            response = self.model.generate_content(prompt)
             return response.text.strip()
         except Exception as e:
             print(f"AI 응답 생성 오류: {e}")
             return f"[AI 오류: {e}]"
 
+    def _judge_trusted(self):
+        """로컬 분류기를 믿을 만큼 LLM 판단 예시가 모였고 확신한 예측이 LLM과 충분히 일치했는지"""
+        classifier = self.judge_classifier
+        return (classifier is not None and classifier.labelled >= self.judge_min_samples
+                and classifier.checked > 0 and classifier.accuracy() >= self.judge_min_accuracy)
+
+    def judge_question_local(self, user_question):
+        """로컬 분류기가 확신하면 True/False, 애매하거나 아직 검증되지 않았거나 분류기가 없으면 None (네트워크 호출 없음)"""
+        if not self._judge_trusted():
+            return None
+        p = self.judge_classifier.predict(user_question)
+        if p >= self.judge_confidence or p <= 1 - self.judge_confidence:
+            self.judge_stats['local'] += 1
+            self.last_judge_source = 'local'
+            print(f"질문 분석 결과(로컬, 확률 {p:.2f}): {p >= 0.5}")
+            return p >= 0.5
+        return None
+
     def judge_question(self, user_question):
-        prompt = f"{user_question}\n\n위 질문에 답하기 위해 책의 내용이 필요하면 'True', 필요하지 않으면 'False'를 출력하세요. 오직 'True' 또는 'False'만 출력해야 합니다."
-        response = self._AI(prompt, fine_tuning=self.judge_fine_tuning)
-        print(f"질문 분석 결과: {response}")
-        resp = (response or "").strip().lower()
+        needs_book = self.judge_question_local(user_question)
+        if needs_book is not None:
+            return needs_book
+        self.judge_stats['llm'] += 1
+        needs_book = self._judge_question_llm(user_question)
+        self.last_judge_source = 'llm' if needs_book is not None else None
+        # LLM 판단을 예시로 추가해 같은 유형의 질문은 다음부터 로컬에서 처리
+        if self.judge_classifier is not None and needs_book is not None:
+            self.judge_classifier.observe(user_question, needs_book, self.judge_confidence)
+        return bool(needs_book)
+
+    def _judge_question_llm(self, user_question):
+        """Gemini 판단 결과 (True/False), 응답이 형식에 맞지 않으면 None"""
+        if not self.judge_model:
+            print("AI 모델을 사용할 수 없습니다.")
+            return None
+        t0 = time.perf_counter()
+        try:
+            if self.judge_cache is not None:
+                # 예시는 서버 캐시에 있으므로 질문만 전송
+                response = self.judge_model.generate_content(user_question)
+            else:
+                response = self.judge_model.generate_content(self.judge_history + [{'role': 'user', 'parts': [user_question]}])
+            text = response.text
+        except Exception as e:
+            print(f"AI 응답 생성 오류: {e}")
+            return None
+        ms = (time.perf_counter() - t0) * 1000
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+        self.judge_stats['llm_ms'] += ms
+        self.judge_stats['prompt_tokens'] += prompt_tokens
+        self.judge_stats['cached_tokens'] += cached_tokens
+        print(f"질문 분석 결과: {text.strip()} ({ms:.0f}ms, 입력 {prompt_tokens}토큰, 캐시 {cached_tokens}토큰)")
+        resp = (text or "").strip().lower()
         if resp not in ("true", "false"):
-            return False 
+            return None
         return resp == "true"
 
+    def create_prompt(self, user_question, ocr_text=None, ocr_path=None):
+        return self.build_prompt(user_question, ocr_text, ocr_path)[0]
 
-    def create_prompt(self, user_question, ocr_text=None):
+    def build_prompt(self, user_question, ocr_text=None, ocr_path=None):
+        """(프롬프트, 응답 캐시 키에 쓸 텍스트). 캐시 키는 프롬프트에 실제로 넣은 책 내용(과 후속 질문의 문맥)으로 만듦"""
+        # 구조화 OCR 결과가 있으면 페이지 전체 대신 질문과 관련된 문단만 보내 프롬프트를 줄임
+        # 스캔 모드에서는 ocr_path가 여러 페이지의 경로 목록이며 모든 페이지의 블록 중에서 고름
+        page_text = ocr_text
+        paths = ocr_path if isinstance(ocr_path, list) else [ocr_path]
+        paths = [path for path in paths if path]
+        layouts = [load_layout(path) for path in paths]
+        if layouts and all(layout is not None for layout in layouts):
+            merged = {
+                'text': "\n\n".join(layout['text'] for layout in layouts),
+                'blocks': [block for layout in layouts for block in layout['blocks']],
+            }
+            ocr_text = relevant_text(merged, user_question)
+        # 지금 보고 있는 페이지는 항상 넣고, 같은 책의 다른 페이지에서 충분히 관련 있는 조각만 덧붙임
+        chunks = self._retrieve(user_question, paths, page_text) if paths and self.library is not None else []
+        if chunks:
+            others = "\n\n".join(f"[페이지 {chunk['page']}]\n{chunk['text']}" for chunk in chunks)
+            ocr_text = f"[지금 보는 페이지]\n{ocr_text or ''}\n\n{others}"
         if ocr_text:
-            return f"책 내용: [\n{ocr_text}\n]\n\n위 책 내용에 대한 질문: [{user_question}]"
-        return user_question
+            prompt = f"책 내용: [\n{ocr_text}\n]\n\n위 책 내용에 대한 질문: [{user_question}]"
+        else:
+            prompt = user_question
+        context = self._memory_context(user_question, page_text)
+        if context:
+            # 후속 질문은 이전 페이지 전체 대신 요약과 대화만으로 답할 수 있도록 앞에 붙임
+            prompt = f"이전 대화: [\n{context}\n]\n\n{prompt}"
+        # 프롬프트에 들어간 문맥은 키에도 넣어, 다른 대화 문맥으로 만든 답이 재사용되지 않게 함
+        cache_text = f"{ocr_text or ''}\x00{context}" if context else ocr_text
+        return prompt, cache_text
+
+    def _memory_context(self, user_question, page_text=None):
+        """프롬프트에 붙일 이전 대화 문맥: 후속 질문일 때만 사용 (스스로 완결된 질문은 문맥 없이 캐시를 함께 씀)"""
+        if self.memory is None or not is_followup(user_question):
+            return ""
+        return self.memory.context(user_question, page_text)
+
+    def followup_page(self, user_question):
+        """후속 질문이면 직전 대화에서 참고한 페이지의 (OCR 텍스트, 경로)를 다시 읽어 반환, 아니면 (None, None)"""
+        if self.memory is None or not is_followup(user_question):
+            return None, None
+        ocr_path = self.memory.recent_page()
+        if ocr_path is None:
+            return None, None
+        try:
+            with open(ocr_path, 'r', encoding='utf-8') as f:
+                return f.read(), ocr_path
+        except OSError as e:
+            print(f"이전 페이지 읽기 오류: {e}")
+            return None, None
+
+    def _retrieve(self, user_question, paths, ocr_text=None):
+        """현재 책 색인에 새 페이지를 추가하고, 지금 페이지 밖에서 관련 조각 검색 (없으면 빈 목록)"""
+        book = self.library.get(self.book_id)
+        for path in paths:
+            # 단일 캡처는 이미 읽은 텍스트를 그대로 사용, 스캔 모드는 페이지 구분 표시가 섞여 있어 파일에서 읽음
+            book.add_page(path, ocr_text if len(paths) == 1 else None)
+        return book.search(user_question, k=self.retrieval_k, exclude_pages=paths)
+
+    def remember(self, user_question, ai_response, ocr_text=None, ocr_path=None):
+        """답변이 끝난 대화를 기억에 추가 (오류 응답은 제외)"""
+        if self.memory is None or not ai_response or ai_response.startswith("[AI 오류"):
+            return
+        self.memory.add(user_question, ai_response, ocr_text, ocr_path if isinstance(ocr_path, str) else None)
+
+    def get_response(self, final_prompt, user_question=None, cache_text=None):
+        """user_question이 주어지면 (질문, build_prompt의 cache_text) 기준으로 응답 캐시를 사용"""
+        cache = self.response_cache if user_question is not None else None
+        if cache is not None:
+            cached = cache.get(user_question, cache_text)
+            if cached is not None:
+                return cached
+        response = self._AI(final_prompt)
+        # 오류 메시지는 캐시하지 않음
+        if cache is not None and self.model and response and not response.startswith("[AI 오류"):
+            cache.put(user_question, cache_text, response)
+        return response
+
+    def stream_response(self, final_prompt, user_question=None, cache_text=None):
+        """응답을 생성되는 대로 조각(str) 단위로 내보내는 제너레이터. 캐시 적중이면 전체를 한 번에 내보냄"""
+        cache = self.response_cache if user_question is not None else None
+        if cache is not None:
+            cached = cache.get(user_question, cache_text)
+            if cached is not None:
+                yield cached
+                return
+        if not self.model:
+            yield "AI 모델을 사용할 수 없습니다."
+            return
+        parts = []
+        try:
+            for chunk in self.model.generate_content(final_prompt, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # 안전 필터 등으로 텍스트가 없는 조각
+                    continue
+                if text:
+                    # 첫 조각 앞의 공백은 _AI()의 strip()과 같게 제거
+                    if not parts:
+                        text = text.lstrip()
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            print(f"AI 응답 생성 오류: {e}")
+            yield ("\n" if parts else "") + f"[AI 오류: {e}]"
+            return
+        response = "".join(parts).strip()
+        if cache is not None and response:
+            cache.put(user_question, cache_text, response)
 
-    def get_response(self, final_prompt):
-        return self._AI(final_prompt)
+    def close(self):
+        stats = self.judge_stats
+        print(f"질문 분석 횟수: 로컬 {stats['local']}회, LLM {stats['llm']}회")
+        if stats['llm']:
+            print(f"LLM 질문 분석 평균: {stats['llm_ms'] / stats['llm']:.0f}ms, 입력 {stats['prompt_tokens'] / stats['llm']:.0f}토큰 "
+                  f"(캐시 {stats['cached_tokens'] / stats['llm']:.0f}토큰)")
+        if self.judge_cache is not None:
+            try:
+                self.judge_cache.delete()
+            except Exception as e:
+                print(f"컨텍스트 캐시 삭제 오류: {e}")
+        if self.response_cache is not None:
+            print(f"응답 캐시 적중률: {self.response_cache.hit_ratio():.0%} "
+                  f"({self.response_cache.hits}/{self.response_cache.hits + self.response_cache.misses})")
+            self.response_cache.close()
 
 if __name__ == '__main__':
     ai = AISystem()
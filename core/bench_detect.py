@@ -0,0 +1,219 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import threading
+
+import cv2
+import psutil
+
+# 프로젝트 루트를 sys.path에 추가
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# detect_sys는 import 시 작업 디렉토리를 프로젝트 루트로 바꾸므로 상대 경로 해석용으로 미리 저장
+LAUNCH_DIR = os.getcwd()
+
+from core.detect_sys import BookDetector
+
+IMG_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+class ReplayCapture:
+    """녹화 영상이나 이미지 시퀀스를 카메라처럼 재생하는 cv2.VideoCapture 대체 객체
+
+    realtime이면 fps 간격으로 프레임을 내보내 실제 카메라처럼 늦은 소비자는 프레임을 놓치게 되고,
+    아니면 가능한 한 빨리 내보낸다. 이미지 한 장은 정지 장면으로 보고 반복 재생한다.
+    """
+    def __init__(self, path, fps=None, realtime=True, loop=False):
+        self.path = str(path)
+        self.realtime = realtime
+        self.loop = loop
+        self.video = None
+        self.images = []
+        if os.path.isdir(self.path):
+            self.images = sorted(f for f in glob.glob(os.path.join(self.path, '*')) if f.lower().endswith(IMG_EXTS))
+        elif self.path.lower().endswith(IMG_EXTS) or any(c in self.path for c in '*?['):
+            self.images = sorted(glob.glob(self.path))
+            self.loop = self.loop or len(self.images) == 1
+        else:
+            self.video = cv2.VideoCapture(self.path)
+        self._cache = {}
+        video_fps = self.video.get(cv2.CAP_PROP_FPS) if self.video is not None else 0
+        self.fps = fps or video_fps or 30.0
+        self._index = 0
+        self._next_t = None
+        self._opened = bool(self.images) or (self.video is not None and self.video.isOpened())
+
+    def isOpened(self):
+        return self._opened
+
+    def _pace(self):
+        if not self.realtime:
+            return
+        now = time.perf_counter()
+        if self._next_t is not None and self._next_t > now:
+            time.sleep(self._next_t - now)
+            now = self._next_t
+        self._next_t = now + 1.0 / self.fps
+
+    def _next_frame(self):
+        if self.video is not None:
+            ret, frame = self.video.read()
+            if not ret and self.loop:
+                self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.video.read()
+            return frame if ret else None
+        if self._index >= len(self.images):
+            if not self.loop:
+                return None
+            self._index = 0
+        path = self.images[self._index]
+        self._index += 1
+        if path not in self._cache:
+            self._cache[path] = cv2.imread(path)
+        # 실제 카메라처럼 매 프레임 새 배열을 돌려줌
+        return self._cache[path].copy()
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        self._pace()
+        frame = self._next_frame()
+        if frame is None:
+            self._opened = False
+            return False, None
+        return True, frame
+
+    def grab(self):
+        return self.read()[0]
+
+    def set(self, prop, value):
+        return False
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0.0
+
+    def release(self):
+        self._opened = False
+        if self.video is not None:
+            self.video.release()
+
+
+class ResourceMonitor:
+    """프로세스 CPU 사용률과 RSS 메모리를 주기적으로 샘플링"""
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.cpu = []
+        self.rss = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.process.cpu_percent(None)
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.cpu.append(self.process.cpu_percent(None))
+            self.rss.append(self.process.memory_info().rss)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        return {
+            'cpu_avg_percent': sum(self.cpu) / len(self.cpu) if self.cpu else 0.0,
+            'cpu_max_percent': max(self.cpu, default=0.0),
+            'rss_max_mb': max(self.rss, default=self.process.memory_info().rss) / 2**20,
+        }
+
+
+def run_benchmark(detector, runs=3, timeout=60.0, run_args=None):
+    """run()을 runs번 반복해 단계별 지연 백분위, 처리량, 캡처까지 걸린 시간을 모은다"""
+    run_args = run_args or {}
+    results = []
+    for i in range(runs):
+        # 매 회 소스를 처음부터 재생하도록 세션을 새로 연다
+        detector.close_session()
+        if not detector.start_session():
+            raise IOError("재생 소스를 열 수 없습니다.")
+        timer = threading.Timer(timeout, detector.stop)
+        timer.start()
+        with ResourceMonitor() as monitor:
+            t0 = time.perf_counter()
+            capture = detector.run(headless=True, **run_args)
+            wall = time.perf_counter() - t0
+        timer.cancel()
+
+        stats = detector.pipeline_stats()
+        results.append({
+            'run': i + 1,
+            'captured': capture is not None,
+            'wall_s': wall,
+            'timing': dict(detector.run_timing),
+            'display_fps': stats['display']['count'] / wall if wall else 0.0,
+            'infer_fps': stats['infer']['count'] / wall if wall else 0.0,
+            'stages': {k: v for k, v in stats.items() if k != 'queue_depth'},
+            'resources': monitor.summary(),
+        })
+    detector.close_session()
+    return results
+
+
+def print_report(results):
+    for r in results:
+        t = r['timing']
+        fmt = lambda v: f"{v:.2f}s" if v is not None else "-"
+        print(f"[run {r['run']}] 캡처 {'성공' if r['captured'] else '실패'} | 첫 프레임 {fmt(t['first_frame_s'])}, "
+              f"첫 검출 {fmt(t['first_detection_s'])}, 캡처 {fmt(t['capture_s'])} | "
+              f"표시 {r['display_fps']:.1f}fps, 추론 {r['infer_fps']:.1f}fps | "
+              f"CPU 평균 {r['resources']['cpu_avg_percent']:.0f}%, RSS 최대 {r['resources']['rss_max_mb']:.0f}MB")
+        for name, s in r['stages'].items():
+            print(f"    {name:>10}: n={s['count']:<5} p50 {s['p50_ms']:.1f}ms  p95 {s['p95_ms']:.1f}ms  "
+                  f"p99 {s['p99_ms']:.1f}ms  max {s['max_ms']:.1f}ms  drop {s['dropped']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="녹화 영상/이미지로 BookDetector 감지 루프를 재생하는 벤치마크 (웹캠 불필요)")
+    parser.add_argument('source', type=str, help='영상 파일, 이미지 폴더 또는 glob 패턴')
+    parser.add_argument('--weights', type=str, default='runs/train/document_yolov5s_results/weights/best.pt', help='모델 가중치')
+    parser.add_argument('--device', type=str, default='cpu', help='cpu 또는 0 (기본값: cpu)')
+    parser.add_argument('--runs', type=int, default=3, help='반복 횟수 (기본값: 3)')
+    parser.add_argument('--fps', type=float, default=None, help='재생 fps (기본값: 영상 fps 또는 30)')
+    parser.add_argument('--no_realtime', action='store_true', help='fps 간격 대기 없이 최대 속도로 재생')
+    parser.add_argument('--loop', action='store_true', help='소스 끝에 도달하면 처음부터 반복')
+    parser.add_argument('--timeout', type=float, default=60.0, help='회당 최대 시간(초) (기본값: 60)')
+    parser.add_argument('--conf_thres', type=float, default=0.7, help='감지 신뢰도 임계값 (기본값: 0.7)')
+    parser.add_argument('--max_det', type=int, default=1, help='이미지당 최대 감지 개수 (기본값: 1)')
+    parser.add_argument('--no_motion_gate', action='store_true', help='움직임 게이트 비활성화')
+    parser.add_argument('--json', type=str, default=None, help='결과를 저장할 JSON 경로')
+    args = parser.parse_args()
+    source = os.path.join(LAUNCH_DIR, args.source)
+    weights = os.path.join(LAUNCH_DIR, args.weights) if os.path.exists(os.path.join(LAUNCH_DIR, args.weights)) else args.weights
+
+    def factory(_source):
+        return ReplayCapture(source, fps=args.fps, realtime=not args.no_realtime, loop=args.loop)
+
+    detector = BookDetector(
+        inform_system=None,
+        weights=weights,
+        device=args.device,
+        headless=True,
+        motion_gate=not args.no_motion_gate,
+        session_cfg={'capture_factory': factory, 'settle_frames': 0},
+    )
+    results = run_benchmark(detector, runs=args.runs, timeout=args.timeout,
+                            run_args={'conf_thres': args.conf_thres, 'max_det': args.max_det})
+    print_report(results)
+    if args.json:
+        with open(os.path.join(LAUNCH_DIR, args.json), 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+        print(f"결과 저장 완료: {args.json}")
@@ -0,0 +1,97 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+import cv2
+from dotenv import load_dotenv
+
+# 프로젝트 루트를 sys.path에 추가
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.http_client import get_client
+from core.ocr_backends import ClovaBackend, TesseractBackend
+from core.page_prep import prepare_page
+
+IMG_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def load_engine(name):
+    """'clova', 'tesseract' 또는 'none' (업로드 크기만 비교)"""
+    if name == 'clova':
+        load_dotenv()
+        engine = ClovaBackend(os.getenv("CLOVA_API_URL"), os.getenv("CLOVA_SECRET_KEY"), get_client())
+    elif name == 'tesseract':
+        engine = TesseractBackend()
+    else:
+        return None
+    if not engine.available():
+        print(f"{name} OCR을 사용할 수 없어 업로드 크기만 비교합니다.")
+        return None
+    return engine
+
+
+def measure(engine, image, quality):
+    """(업로드 바이트, 인코딩 ms, OCR ms, 인식 글자 수)"""
+    t0 = time.perf_counter()
+    jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+    encode_ms = (time.perf_counter() - t0) * 1000
+    ocr_ms, chars = None, None
+    if engine is not None:
+        t0 = time.perf_counter()
+        layout = engine.recognize(jpeg)
+        ocr_ms = (time.perf_counter() - t0) * 1000
+        chars = len(layout['text']) if layout else 0
+    return len(jpeg), encode_ms, ocr_ms, chars
+
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="페이지 전처리(펴기+리샘플) 전후 OCR 업로드 크기와 지연 비교")
+    parser.add_argument('source', type=str, help='캡처 이미지 폴더 또는 glob 패턴 (예: conversation/image)')
+    parser.add_argument('--engine', type=str, default='none', choices=['clova', 'tesseract', 'none'], help='OCR 엔진 (기본값: none)')
+    parser.add_argument('--quality', type=int, default=95, help='JPEG 품질 (기본값: 95)')
+    parser.add_argument('--target_text_height', type=int, default=24, help='목표 글자 높이(px) (기본값: 24)')
+    parser.add_argument('--json', type=str, default=None, help='결과를 저장할 JSON 경로')
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        paths = sorted(f for f in glob.glob(os.path.join(args.source, '*')) if f.lower().endswith(IMG_EXTS))
+    else:
+        paths = sorted(glob.glob(args.source))
+    if not paths:
+        sys.exit(f"이미지를 찾을 수 없습니다: {args.source}")
+    engine = load_engine(args.engine)
+
+    results = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        t0 = time.perf_counter()
+        page, info = prepare_page(image, target_text_height=args.target_text_height)
+        prep_ms = (time.perf_counter() - t0) * 1000
+        before = measure(engine, image, args.quality)
+        after = measure(engine, page, args.quality)
+        results.append({'path': path, 'info': info, 'prep_ms': prep_ms, 'before': before, 'after': after})
+        ocr = f", OCR {before[2]:.0f} -> {after[2]:.0f}ms, 글자 {before[3]} -> {after[3]}" if engine else ""
+        print(f"{os.path.basename(path)}: {image.shape[1]}x{image.shape[0]} -> {page.shape[1]}x{page.shape[0]}, "
+              f"{before[0] / 1024:.0f} -> {after[0] / 1024:.0f}KB, 전처리 {prep_ms:.0f}ms{ocr}")
+
+    if engine is not None:
+        engine.close()
+    b_bytes, a_bytes = mean(r['before'][0] for r in results), mean(r['after'][0] for r in results)
+    print(f"\n{len(results)}장 평균 업로드 {b_bytes / 1024:.0f}KB -> {a_bytes / 1024:.0f}KB "
+          f"({(1 - a_bytes / b_bytes) * 100:.0f}% 감소), 전처리 {mean(r['prep_ms'] for r in results):.0f}ms")
+    if engine is not None:
+        print(f"평균 OCR 지연 {mean(r['before'][2] for r in results):.0f}ms -> {mean(r['after'][2] for r in results):.0f}ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+        print(f"결과 저장 완료: {args.json}")
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+import torch
+
+# 프로젝트 루트를 sys.path에 추가
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.augmentations import LetterboxPreprocessor, letterbox
+
+
+def baseline_preprocess(frame, imgsz, stride, auto, device, half):
+    """기존 detect_sys 경로: letterbox -> transpose -> [::-1] -> copy -> from_numpy -> dtype 변환 -> /255"""
+    im = letterbox(frame, imgsz, stride=stride, auto=auto)[0]
+    im = im.transpose((2, 0, 1))[::-1]
+    im = torch.from_numpy(im.copy()).to(device)
+    im = im.half() if half else im.float()
+    im /= 255.0
+    return im[None]
+
+
+def measure(fn, frames, iters, device):
+    """프레임당 지연(ms) 백분위, numpy 할당 바이트, (CUDA) 텐서 할당 횟수를 측정"""
+    for frame in frames[:3]:
+        fn(frame)  # 버퍼 할당/캐시를 측정에서 제외
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+        allocs0 = torch.cuda.memory_stats().get('allocation.all.allocated', 0)
+
+    latencies = []
+    for i in range(iters):
+        frame = frames[i % len(frames)]
+        t0 = time.perf_counter()
+        fn(frame)
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    for i in range(min(iters, 50)):
+        fn(frames[i % len(frames)])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'mean_ms': float(np.mean(latencies)),
+        'peak_alloc_kb': peak / 1024,
+    }
+    if device.type == 'cuda':
+        allocs = torch.cuda.memory_stats().get('allocation.all.allocated', 0) - allocs0
+        result['cuda_allocs_per_frame'] = allocs / iters
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="감지기 전처리 마이크로 벤치마크 (기존 경로 vs 재사용 버퍼 경로)")
+    parser.add_argument('--width', type=int, default=1280, help='입력 프레임 너비 (기본값: 1280)')
+    parser.add_argument('--height', type=int, default=720, help='입력 프레임 높이 (기본값: 720)')
+    parser.add_argument('--imgsz', type=int, default=640, help='추론 이미지 크기 (기본값: 640)')
+    parser.add_argument('--iters', type=int, default=300, help='반복 횟수 (기본값: 300)')
+    parser.add_argument('--device', type=str, default='cpu', help='cpu 또는 cuda:0')
+    parser.add_argument('--half', action='store_true', help='FP16 출력')
+    parser.add_argument('--no-auto', action='store_true', help='최소 사각형(auto) 패딩 대신 정사각형 패딩')
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    imgsz, stride, auto = (args.imgsz, args.imgsz), 32, not args.no_auto
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(4)]
+    fused = LetterboxPreprocessor(imgsz, stride=stride, auto=auto, device=device, half=args.half)
+
+    diff = (baseline_preprocess(frames[0], imgsz, stride, auto, device, args.half) - fused(frames[0])).abs().max().item()
+    print(f"출력 최대 오차: {diff:.2e}")
+
+    results = {
+        'baseline': measure(lambda f: baseline_preprocess(f, imgsz, stride, auto, device, args.half), frames, args.iters, device),
+        'fused': measure(fused, frames, args.iters, device),
+    }
+    print(f"입력 {args.width}x{args.height} -> {imgsz}, device={device}, half={args.half}, iters={args.iters}")
+    for name, r in results.items():
+        line = f"{name:>8}: p50 {r['p50_ms']:.2f}ms, p95 {r['p95_ms']:.2f}ms, 평균 {r['mean_ms']:.2f}ms, 최대 numpy 할당 {r['peak_alloc_kb']:.0f}KB"
+        if 'cuda_allocs_per_frame' in r:
+            line += f", CUDA 할당 {r['cuda_allocs_per_frame']:.1f}회/프레임"
+        print(line)
+    speedup = results['baseline']['mean_ms'] / max(results['fused']['mean_ms'], 1e-9)
+    print(f"평균 지연 {speedup:.2f}배 개선")
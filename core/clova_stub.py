@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import default as email_policy
+
+import cv2
+import numpy as np
+
+# 프로젝트 루트를 sys.path에 추가
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.http_stub import StubServer
+
+SAMPLE_LINES = [
+    "새는 알에서 나오려고 투쟁한다.",
+    "알은 세계이다.",
+    "태어나려는 자는 하나의 세계를 깨뜨려야 한다.",
+    "새는 신에게로 날아간다.",
+    "그 신의 이름은 아브락사스다.",
+]
+
+
+def make_fields(lines=None, width=1000, line_height=40, margin=50):
+    """줄 목록을 Clova V2 fields 형식(단어별 boundingPoly, 줄 끝 lineBreak)으로 생성"""
+    fields = []
+    for i, line in enumerate(lines or SAMPLE_LINES):
+        words = line.split()
+        x, y = margin, margin + i * line_height * 1.5
+        step = (width - 2 * margin) / max(len(line), 1)
+        for j, word in enumerate(words):
+            w = step * len(word)
+            fields.append({
+                'valueType': 'ALL',
+                'boundingPoly': {'vertices': [
+                    {'x': x, 'y': y}, {'x': x + w, 'y': y}, {'x': x + w, 'y': y + line_height}, {'x': x, 'y': y + line_height}
+                ]},
+                'inferText': word,
+                'inferConfidence': 0.99,
+                'type': 'NORMAL',
+                'lineBreak': j == len(words) - 1,
+            })
+            x += w + step
+    return fields
+
+
+def parse_multipart(headers, body):
+    """multipart/form-data 본문을 {이름: 바이트}로 분해"""
+    content_type = headers.get('Content-Type') or headers.get('content-type') or ''
+    message = BytesParser(policy=email_policy).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    parts = {}
+    if message.is_multipart():
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if name:
+                parts[name] = part.get_payload(decode=True)
+    return parts
+
+
+class ClovaStub:
+    """Clova OCR V2 multipart 요청/응답 형식을 흉내 내는 로컬 서버 (부하 테스트용)
+
+    - latency, jitter: 응답 지연(초) = max(0, N(latency, jitter))
+    - error_rate: 이 확률로 500/503 응답 (재시도 경로 확인용)
+    - fields: 응답에 넣을 Clova fields 목록 (None이면 SAMPLE_LINES로 생성)
+    - secret: 설정하면 X-OCR-SECRET 헤더가 다를 때 401
+    """
+    def __init__(self, host='127.0.0.1', port=0, path='/ocr', latency=1.0, jitter=0.2, error_rate=0.0, fields=None,
+                 secret=None, seed=None):
+        self.path = path
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fields = fields if fields is not None else make_fields()
+        self.secret = secret
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {'ok': 0, 'error': 0, 'bad_request': 0}
+        self.server = StubServer({('POST', path): self.handle}, host=host, port=port)
+
+    @property
+    def url(self):
+        return self.server.url(self.path)
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def handle(self, request):
+        with self._lock:
+            delay = max(0.0, self._random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            fail = self._random.random() < self.error_rate
+        if self.secret is not None and request['headers'].get('X-OCR-SECRET') != self.secret:
+            self._count('bad_request')
+            return 401, {'code': '0002', 'message': 'Authentication failed'}
+        parts = parse_multipart(request['headers'], request['body'])
+        try:
+            message = json.loads(parts['message'])
+            assert message.get('version') == 'V2' and message.get('images')
+            image = parts['file']
+        except (KeyError, ValueError, AssertionError):
+            self._count('bad_request')
+            return 400, {'code': '0011', 'message': 'Request invalid'}
+        time.sleep(delay)
+        if fail:
+            self._count('error')
+            return self._random.choice([500, 503]), {'code': '0500', 'message': 'Internal server error'}
+
+        decoded = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        height, width = (decoded.shape[0] * 8, decoded.shape[1] * 8) if decoded is not None else (0, 0)
+        self._count('ok')
+        return 200, {
+            'version': 'V2',
+            'requestId': message.get('requestId'),
+            'timestamp': int(time.time() * 1000),
+            'images': [{
+                'uid': uuid.uuid4().hex,
+                'name': message['images'][0].get('name', 'document'),
+                'inferResult': 'SUCCESS',
+                'message': 'SUCCESS',
+                'validationResult': {'result': 'NO_REQUESTED'},
+                'convertedImageInfo': {'width': width, 'height': height, 'pageIndex': 0, 'longImage': False},
+                'fields': self.fields,
+            }],
+        }
+
+    def start(self):
+        self.server.start()
+        return self
+
+    def stop(self):
+        self.server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Clova OCR V2 호환 로컬 대체 서버")
+    parser.add_argument('--port', type=int, default=8500, help='포트 (기본값: 8500)')
+    parser.add_argument('--latency', type=float, default=1.0, help='평균 응답 지연(초) (기본값: 1.0)')
+    parser.add_argument('--jitter', type=float, default=0.2, help='응답 지연 표준편차(초) (기본값: 0.2)')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='500/503 응답 비율 (기본값: 0)')
+    parser.add_argument('--fields', type=str, default=None, help='응답 fields JSON 파일 (Clova 응답 전체 또는 fields 목록)')
+    parser.add_argument('--secret', type=str, default='stub-secret', help='요구할 X-OCR-SECRET 값')
+    args = parser.parse_args()
+
+    fields = None
+    if args.fields:
+        with open(args.fields, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        fields = data['images'][0]['fields'] if isinstance(data, dict) else data
+
+    stub = ClovaStub(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     fields=fields, secret=args.secret).start()
+    print(f"Clova 대체 서버 실행 중: {stub.url}")
+    print(f"  CLOVA_API_URL={stub.url} CLOVA_SECRET_KEY={args.secret}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"종료: {stub.counts}")
+        stub.stop()
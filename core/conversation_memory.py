@@ -0,0 +1,130 @@
+import re
+import time
+import threading
+from collections import deque
+
+from core.ocr_layout import relevant_text
+from core.response_cache import text_hash
+
+
+def _bigrams(text):
+    text = "".join(text.split())
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+# 앞 대화를 가리키는 표현 (지시어, 이어 묻기). 이런 질문만 이전 대화에 따라 답이 달라진다고 봄
+FOLLOWUP_PATTERN = re.compile(
+    r"(그거|그것|그게|그건|그걸|그런|그렇|그럼|그러면|그래서|그러니까|그때|그 ?사람|그 ?부분|그 ?말|그 ?뜻|그는|그녀|"
+    r"아까|방금|앞에서|위에서|이전|더 ?자세히|더 ?설명|더 ?알려|다시|계속|예를 ?들|왜 ?그)"
+)
+
+
+def is_followup(question):
+    """이전 대화를 알아야 답할 수 있는 후속 질문인지 (지시어 포함 또는 '왜?'처럼 매우 짧은 질문)"""
+    question = (question or "").strip()
+    return bool(FOLLOWUP_PATTERN.search(question)) or len(re.sub(r'[\W_]+', '', question)) <= 3
+
+
+def estimate_tokens(text):
+    """대략적인 토큰 수 (한글 1글자 = 약 1토큰, 영문 3~4글자 = 약 1토큰으로 보고 UTF-8 바이트 수 / 3)"""
+    return len((text or "").encode('utf-8')) // 3 + 1
+
+
+def summarize_page(page_text, query, max_chars=300):
+    """페이지에서 질문/답변과 겹치는 문단만 골라 max_chars 이내로 줄인 요약"""
+    paragraphs = [p for p in page_text.split("\n\n") if p.strip()]
+    excerpt = relevant_text({'text': page_text, 'blocks': [{'text': p} for p in paragraphs]}, query, max_chars=max_chars)
+    return excerpt if len(excerpt) <= max_chars else excerpt[:max_chars] + "…"
+
+
+class ConversationMemory:
+    """이전 질문/답변과 참고한 페이지 요약을 보관하고, 새 질문마다 토큰 예산 안에서 최근성+관련도 순으로 골라 문맥을 만듦
+
+    - token_budget: 문맥에 쓸 최대 토큰 수 (estimate_tokens 기준)
+    - max_turns: 보관할 최대 대화 수
+    - answer_chars, page_chars: 대화 하나에 저장할 답변/페이지 요약 길이
+    - idle_timeout: 이 시간(초) 동안 질문이 없으면 다른 사용자로 보고 기억을 비움
+    """
+    def __init__(self, token_budget=600, max_turns=20, answer_chars=300, page_chars=300, recency_decay=0.7, idle_timeout=600):
+        self.token_budget = token_budget
+        self.answer_chars = answer_chars
+        self.page_chars = page_chars
+        self.recency_decay = recency_decay
+        self.idle_timeout = idle_timeout
+        self.turns = deque(maxlen=max_turns)
+        self._last_time = time.time()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        if self.turns and time.time() - self._last_time > self.idle_timeout:
+            print("대화 기억 초기화 (오래 사용하지 않음)")
+            self.turns.clear()
+
+    def add(self, question, answer, page_text=None, page_path=None):
+        """page_path: 페이지 OCR 파일 경로 (후속 질문에서 다시 캡처하지 않고 같은 페이지를 읽을 때 사용)"""
+        answer = answer if len(answer) <= self.answer_chars else answer[:self.answer_chars] + "…"
+        turn = {'question': question, 'answer': answer, 'page_key': text_hash(page_text), 'page': None, 'page_path': page_path}
+        if page_text:
+            turn['page'] = summarize_page(page_text, f"{question} {answer}", self.page_chars)
+        with self._lock:
+            self._expire()
+            self.turns.append(turn)
+            self._last_time = time.time()
+
+    def recent_page(self):
+        """가장 최근에 페이지를 참고한 대화의 OCR 파일 경로, 없으면 None"""
+        with self._lock:
+            self._expire()
+            return next((turn['page_path'] for turn in reversed(self.turns) if turn['page'] and turn['page_path']), None)
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+
+    def context(self, question, current_page=None):
+        """예산 안에서 고른 이전 대화와 페이지 요약 (시간 순서), 기억이 없으면 빈 문자열
+
+        current_page: 이번 프롬프트에 이미 들어가는 페이지 텍스트 (같은 페이지 요약은 생략)
+        """
+        with self._lock:
+            self._expire()
+            turns = list(self.turns)
+        if not turns or self.token_budget <= 0:
+            return ""
+        query = _bigrams(question)
+        scored = []
+        for age, turn in enumerate(reversed(turns)):
+            relevance = len(query & _bigrams(f"{turn['question']} {turn['answer']} {turn['page'] or ''}")) / max(len(query), 1)
+            # 바로 이전 대화는 "그거 더 설명해줘" 같은 후속 질문이 가리키는 대상이라 항상 우선
+            score = float('inf') if age == 0 else self.recency_decay ** age + relevance
+            scored.append((score, len(turns) - 1 - age))
+
+        chosen, pages, used = [], {text_hash(current_page)}, 0
+        for _, i in sorted(scored, reverse=True):
+            turn = turns[i]
+            cost = estimate_tokens(turn['question']) + estimate_tokens(turn['answer'])
+            # 같은 페이지 요약은 한 번만 포함
+            with_page = turn['page'] is not None and turn['page_key'] not in pages
+            if with_page:
+                cost += estimate_tokens(turn['page'])
+            if used + cost > self.token_budget:
+                if not with_page:
+                    continue
+                # 페이지 요약 없이라도 들어가면 대화만 포함
+                cost -= estimate_tokens(turn['page'])
+                with_page = False
+                if used + cost > self.token_budget:
+                    continue
+            chosen.append((i, with_page))
+            if with_page:
+                pages.add(turn['page_key'])
+            used += cost
+
+        lines = []
+        for i, with_page in sorted(chosen):
+            turn = turns[i]
+            if with_page:
+                lines.append(f"(참고한 책 내용 요약: {turn['page']})")
+            lines.append(f"사용자: {turn['question']}")
+            lines.append(f"AI: {turn['answer']}")
+        return "\n".join(lines)
@@ -1,5 +1,9 @@
 import cv2
 import time
+import heapq
+from collections import deque
+import queue
+import threading
 import torch
 from pathlib import Path
 import sys
@@ -18,14 +22,412 @@ from models.common import DetectMultiBackend
 from utils.general import (
     check_img_size,
     non_max_suppression,
+    single_class_top_nms,
     scale_boxes
 )
 from utils.plots import Annotator, colors
 from utils.torch_utils import select_device
-from utils.augmentations import letterbox
+from utils.augmentations import LetterboxPreprocessor
+from core.tracker import StabilityTracker, box_iou, center_distance
+from core.ocr_cache import page_hash
+
+
+class StageStats:
+    """파이프라인 단계별 처리 횟수, 지연 시간(ms), 버린 프레임 수 카운터 (최근 window개 샘플로 백분위 계산)"""
+    def __init__(self, window=2048):
+        self._lock = threading.Lock()
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.samples = deque(maxlen=self.window)
+            self.count = 0
+            self.dropped = 0
+            self.total_ms = 0.0
+            self.last_ms = 0.0
+            self.max_ms = 0.0
+
+    def add(self, ms):
+        with self._lock:
+            self.count += 1
+            self.samples.append(ms)
+            self.total_ms += ms
+            self.last_ms = ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def drop(self, n=1):
+        with self._lock:
+            self.dropped += n
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self.samples)
+        def pct(q):
+            return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+        return {
+            'count': self.count,
+            'dropped': self.dropped,
+            'avg_ms': self.total_ms / self.count if self.count else 0.0,
+            'last_ms': self.last_ms,
+            'max_ms': self.max_ms,
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95),
+            'p99_ms': pct(0.99),
+        }
+
+
+class LatestQueue(queue.Queue):
+    """가득 차면 가장 오래된 항목을 버리고 새 항목을 넣는 bounded 큐 (항상 최신 프레임 유지)"""
+    def __init__(self, maxsize=1, stats=None):
+        super().__init__(maxsize)
+        self.stats = stats
+
+    def put_latest(self, item):
+        while True:
+            try:
+                self.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.get_nowait()
+                    if self.stats is not None:
+                        self.stats.drop()
+                except queue.Empty:
+                    pass
+
+    def clear(self):
+        while True:
+            try:
+                self.get_nowait()
+            except queue.Empty:
+                return
+
+
+class MotionGate:
+    """축소한 흑백 프레임 차분으로 장면 변화를 감지해, 정지 상태에서는 모델 추론을 건너뛰게 하는 게이트"""
+    def __init__(self, width=160, pixel_thres=25, motion_ratio=0.02, max_skip=10):
+        self.width = width
+        self.pixel_thres = pixel_thres
+        self.motion_ratio = motion_ratio
+        self.max_skip = max_skip
+        self.reset()
+
+    def reset(self):
+        self._ref = None
+        self._gray = None
+        self._diff = None
+        self._skipped = 0
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.width, max(1, int(h * self.width / w)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, frame):
+        """모델을 다시 돌려야 하면 True (움직임 감지, 기준 프레임 없음, max_skip 도달)"""
+        self._gray = self._prepare(frame)
+        if self._ref is None or self._ref.shape != self._gray.shape or self._skipped >= self.max_skip:
+            return True
+        # 직전 프레임이 아닌 마지막 추론 프레임과 비교해 느린 이동도 누적되어 잡히도록 함
+        self._diff = cv2.absdiff(self._gray, self._ref, dst=self._diff)
+        moved = cv2.countNonZero(cv2.threshold(self._diff, self.pixel_thres, 255, cv2.THRESH_BINARY)[1])
+        if moved > self.motion_ratio * self._diff.size:
+            return True
+        self._skipped += 1
+        return False
+
+    def update(self):
+        """방금 check한 프레임으로 모델을 돌렸을 때 호출해 기준 프레임을 갱신"""
+        self._ref, self._gray = self._gray, None
+        self._skipped = 0
+
+
+def sharpness(frame, bbox, width=320):
+    """박스 영역을 축소한 흑백 이미지의 라플라시안 분산 (클수록 선명)"""
+    x1, y1, x2, y2 = [int(v) for v in bbox]
+    h, w = frame.shape[:2]
+    roi = frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
+    if roi.size == 0:
+        return 0.0
+    if roi.shape[1] > width:
+        roi = cv2.resize(roi, (width, max(1, int(roi.shape[0] * width / roi.shape[1]))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))[1][0][0]
+    return float(std * std)
+
+
+class BestFrameBuffer:
+    """트랙별 안정 구간 동안 선명도 상위 size개 프레임만 보관하는 고정 크기 버퍼"""
+    def __init__(self, size=3):
+        self.size = size
+        self.reset()
+
+    def reset(self):
+        self._heaps = {}
+        self._epochs = {}
+        self._seq = 0
+
+    def add(self, track, frame, score):
+        # 트랙의 안정 타이머가 재시작되면 이전 후보는 위치가 다르므로 폐기
+        if self._epochs.get(track.id) != track.stable_since:
+            self._epochs[track.id] = track.stable_since
+            self._heaps[track.id] = []
+        heap = self._heaps[track.id]
+        self._seq += 1
+        entry = (score, self._seq, frame, track.bbox())
+        if len(heap) < self.size:
+            heapq.heappush(heap, entry)
+        elif score > heap[0][0]:
+            heapq.heapreplace(heap, entry)
+
+    def best(self, track):
+        """(frame, bbox, score) 또는 후보가 없으면 None"""
+        heap = self._heaps.get(track.id)
+        if not heap or self._epochs.get(track.id) != track.stable_since:
+            return None
+        score, _, frame, bbox = max(heap, key=lambda e: (e[0], e[1]))
+        return frame, bbox, score
+
+    def prune(self, tracks):
+        ids = {t.id for t in tracks}
+        for tid in list(self._heaps):
+            if tid not in ids:
+                del self._heaps[tid]
+                self._epochs.pop(tid, None)
+
+
+class PreviewBuffer:
+    """헤드리스 모드에서 주석이 그려진 최신 프레임을 UI 스레드와 공유하는 버퍼 (size: 최대 (w, h))"""
+    def __init__(self, size=None):
+        self.size = size
+        self._lock = threading.Lock()
+        self._frame = None
+        self._seq = 0
+
+    def publish(self, frame):
+        if self.size is not None:
+            # size 안에 들어가도록 비율을 유지해 축소/확대
+            h, w = frame.shape[:2]
+            r = min(self.size[0] / w, self.size[1] / h)
+            if r != 1:
+                frame = cv2.resize(frame, (int(w * r), int(h * r)), interpolation=cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR)
+        with self._lock:
+            # 매번 새 배열을 넣으므로 UI가 참조 중인 이전 프레임은 덮어쓰지 않음
+            self._frame = frame
+            self._seq += 1
+
+    def get(self, last_seq=0):
+        """(seq, frame) 반환. 새 프레임이 없으면 frame은 None"""
+        with self._lock:
+            if self._seq == last_seq:
+                return last_seq, None
+            return self._seq, self._frame
+
+    def clear(self):
+        with self._lock:
+            self._frame = None
+            self._seq += 1
+
+
+class CameraSession:
+    """카메라를 한 번만 열어 두고 최신 프레임을 큐에 계속 갱신하는 장기 세션 (캡처 단계)"""
+    def __init__(self, source=0, buffer_size=1, settle_frames=5, capture_factory=None, stats=None, frame_event=None,
+                 max_failures=100):
+        self.source = source
+        # 테스트/벤치마크용으로 cv2.VideoCapture 대신 같은 인터페이스의 프레임 소스를 주입할 수 있음
+        self.capture_factory = capture_factory
+        self.buffer_size = buffer_size
+        self.settle_frames = settle_frames
+        # read()가 연속으로 이만큼 실패하면 (카메라 분리 등) 세션을 끝내고 error에 이유를 남김
+        self.max_failures = max_failures
+        self.error = None
+        self.cap = None
+        # 여러 카메라를 묶을 때는 통계와 새 프레임 알림 이벤트를 공유
+        self.stats = stats or StageStats()
+        self.frame_event = frame_event
+        self.frames = LatestQueue(maxsize=1, stats=self.stats)
+        self._frame_id = 0
+        self._running = False
+        self._active = threading.Event()
+        self._flush = 0
+        self._thread = None
+
+    def open(self):
+        if self.is_opened():
+            return True
+        cap = self.capture_factory(self.source) if self.capture_factory else cv2.VideoCapture(int(self.source))
+        if not cap.isOpened():
+            raise IOError(f"웹캠 {self.source}를 열 수 없습니다.")
+        # 드라이버 버퍼를 최소화해 항상 최신 프레임을 받도록 설정
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        # 자동 노출/화이트밸런스가 자리잡을 때까지 초기 프레임은 버림
+        for _ in range(self.settle_frames):
+            cap.read()
+        self.cap = cap
+        self.error = None
+        self._running = True
+        self._active.set()
+        self._thread = threading.Thread(target=self._update, daemon=True)
+        self._thread.start()
+        return True
+
+    def is_opened(self):
+        return self.cap is not None and self.cap.isOpened() and self._running
+
+    def _update(self):
+        failures = 0
+        while self._running:
+            if not self._active.wait(timeout=0.1):
+                continue
+            if self._flush > 0:
+                # 일시정지 동안 드라이버에 쌓인 오래된 프레임 제거
+                self.cap.grab()
+                self._flush -= 1
+                continue
+            t0 = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                failures += 1
+                if failures >= self.max_failures:
+                    self.error = f"웹캠 {self.source}에서 프레임을 {failures}번 연속으로 읽지 못했습니다."
+                    print(f"카메라 오류: {self.error}")
+                    self._running = False
+                    break
+                time.sleep(0.01)
+                continue
+            failures = 0
+            self.stats.add((time.perf_counter() - t0) * 1000)
+            self._frame_id += 1
+            self.frames.put_latest((self._frame_id, time.perf_counter(), frame))
+            if self.frame_event is not None:
+                self.frame_event.set()
+
+    def read(self, timeout=1.0):
+        """가장 최근 프레임 (frame_id, 캡처 시각, frame)을 반환, 시간 초과 시 None"""
+        try:
+            return self.frames.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def pause(self):
+        self._active.clear()
+        self.frames.clear()
+
+    def resume(self):
+        if not self._active.is_set():
+            self._flush = self.buffer_size + 1
+            self.frames.clear()
+            self._active.set()
+
+    def is_paused(self):
+        return not self._active.is_set()
+
+    def queue_depth(self):
+        return self.frames.qsize()
+
+    def close(self):
+        self._running = False
+        self._active.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+def normalize_source(source):
+    """카메라 소스를 단일 값 또는 2개 이상의 리스트로 정리 ([0] -> 0)"""
+    if isinstance(source, (list, tuple)):
+        return source[0] if len(source) == 1 else list(source)
+    return source
+
+
+def tile_views(views):
+    """여러 카메라 표시 프레임을 첫 카메라 높이에 맞춰 가로로 이어 붙임"""
+    if len(views) == 1:
+        return views[0]
+    h = views[0].shape[0]
+    views = [v if v.shape[0] == h else cv2.resize(v, (max(1, int(v.shape[1] * h / v.shape[0])), h)) for v in views]
+    return cv2.hconcat(views)
+
+
+class MultiCameraSession:
+    """여러 카메라를 LoadStreams처럼 소스별 스레드로 동시에 읽고, 카메라별 최신 프레임을 한 묶음으로 내주는 세션
+
+    CameraSession과 같은 인터페이스이며 read()는 (묶음 id, 가장 이른 캡처 시각, [frame, ...])을 반환한다.
+    새 프레임이 없는 카메라는 직전 프레임을 재사용한다.
+    """
+    def __init__(self, sources, **session_cfg):
+        self.source = list(sources)
+        self.stats = StageStats()
+        self._new_frame = threading.Event()
+        self.sessions = [CameraSession(s, stats=self.stats, frame_event=self._new_frame, **session_cfg) for s in self.source]
+        self._latest = [None] * len(self.sessions)
+        self._batch_id = 0
+
+    def open(self):
+        try:
+            for session in self.sessions:
+                session.open()
+        except Exception:
+            self.close()
+            raise
+        return True
+
+    def is_opened(self):
+        return all(s.is_opened() for s in self.sessions)
+
+    @property
+    def error(self):
+        return next((s.error for s in self.sessions if s.error), None)
+
+    def read(self, timeout=1.0):
+        """모든 카메라의 최신 프레임 묶음을 반환, 시간 초과 시 None"""
+        deadline = time.perf_counter() + timeout
+        while True:
+            self._new_frame.clear()
+            fresh = []
+            for i, session in enumerate(self.sessions):
+                try:
+                    self._latest[i] = session.frames.get_nowait()
+                    fresh.append(self._latest[i][1])
+                except queue.Empty:
+                    pass
+            if fresh and all(item is not None for item in self._latest):
+                self._batch_id += 1
+                return self._batch_id, min(fresh), [item[2] for item in self._latest]
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not self._new_frame.wait(remaining):
+                return None
+
+    def pause(self):
+        for session in self.sessions:
+            session.pause()
+        self._latest = [None] * len(self.sessions)
+
+    def resume(self):
+        for session in self.sessions:
+            session.resume()
+
+    def is_paused(self):
+        return any(s.is_paused() for s in self.sessions)
+
+    def queue_depth(self):
+        return sum(s.queue_depth() for s in self.sessions)
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+
 
 class BookDetector:
-    def __init__(self, inform_system, weights=None, data='data/coco128.yaml', device='', half=False, camera_source=0):
+    def __init__(self, inform_system, weights=None, data='data/coco128.yaml', device='', half=False, camera_source=0,
+                 motion_gate=True, gate_every=10, tracker_cfg=None, best_frames=3, headless=False, session_cfg=None,
+                 postprocess='top1'):
         
         if weights is None:
             custom_weights = 'runs/train/document_yolov5s_results/weights/best.pt'
@@ -40,108 +442,355 @@ class BookDetector:
         self.device = select_device(device)
         self.model = DetectMultiBackend(weights, device=self.device, dnn=False, data=data, fp16=half)
         self.stride, self.names, self.pt = self.model.stride, self.model.names, self.model.pt
+        # 관심 클래스(document) 인덱스를 한 번만 찾아 두고 프레임마다 문자열 비교를 하지 않음
+        names = self.names.items() if isinstance(self.names, dict) else enumerate(self.names)
+        self.doc_cls = next((int(i) for i, n in names if str(n).lower() == 'document'), None)
+        if self.doc_cls is None:
+            print("모델에 'document' 클래스가 없습니다. 문서가 감지되지 않습니다.")
+        # 'top1': 문서 클래스 전용 빠른 후처리, 'nms': 일반 non_max_suppression
+        self.postprocess = postprocess
         self.imgsz = check_img_size((640, 640), s=self.stride)
+        # letterbox/BGR->RGB/CHW/정규화를 재사용 버퍼에서 한 번에 처리 (프레임마다 새 배열 할당 없음)
+        self.preprocess = LetterboxPreprocessor(self.imgsz, stride=self.stride, auto=self.pt, device=self.device, half=self.model.fp16)
+        # 카메라별 해상도가 달라 최소 사각형 크기가 다르면 LoadStreams처럼 정사각형 패딩으로 배치를 맞춤
+        self.square_preprocess = LetterboxPreprocessor(self.imgsz, stride=self.stride, auto=False, device=self.device, half=self.model.fp16)
         self.inform_system = inform_system
+        # 정수 하나 또는 [0, 1]처럼 여러 카메라 소스 (여러 개면 한 번의 배치 추론으로 함께 감지)
         self.camera_source = camera_source
+        self.session = None
+        # CameraSession 추가 인자 (buffer_size, settle_frames, capture_factory 등)
+        self.session_cfg = session_cfg or {}
+        self.result_queue = None
+        self.run_timing = {}
+        self.stage_stats = {'gate': StageStats(), 'infer': StageStats(), 'display': StageStats(), 'end_to_end': StageStats()}
+        # 정지 장면에서는 마지막 박스를 그대로 전달하고 gate_every 프레임마다만 모델로 재확인
+        self.motion_gate = motion_gate
+        self.gate_every = gate_every
+        # 안정성 판정 임계값은 tracker_cfg로 조정 (StabilityTracker 인자 참고)
+        # 카메라마다 좌표계가 다르므로 트래커와 선명도 후보 버퍼는 카메라별로 둠 (run()에서 개수 맞춤)
+        self.tracker_cfg = tracker_cfg or {}
+        self.trackers = [StabilityTracker(**self.tracker_cfg)]
+        # 안정 구간 중 가장 선명한 프레임을 OCR로 넘기기 위한 후보 버퍼
+        self.best_frames_size = best_frames
+        self.best_frames = [BestFrameBuffer(size=best_frames)]
+        # headless면 OpenCV 창 대신 preview 버퍼로 프레임을 내보내고 UI가 직접 그림
+        self.headless = headless
+        self.preview = PreviewBuffer()
+        # 마지막 run()이 카메라 오류로 끝났으면 그 이유 (UI 표시용)
+        self.last_error = None
+        self._cancel = threading.Event()
+        self.warmup()
+
+    def warmup(self):
+        # 첫 추론 시 발생하는 cuDNN/oneDNN 초기화 비용을 시작 시점에 미리 지불
+        # (DetectMultiBackend.warmup은 CPU에서 생략되므로 직접 한 번 실행)
+        im = torch.zeros(1, 3, *self.imgsz, dtype=torch.half if self.model.fp16 else torch.float, device=self.device)
+        with torch.no_grad():
+            self.model(im)
 
-    def run(self, source=None, conf_thres=0.6, iou_thres=0.45, max_det=1000, classes=None, agnostic_nms=False):
+    def start_session(self, source=None):
+        """카메라 세션을 열고 대기 상태(일시정지)로 둔다."""
+        source = normalize_source(self.camera_source if source is None else source)
+        if self.session is not None and self.session.is_opened() and str(self.session.source) == str(source):
+            return True
+        self.close_session()
         try:
-            source = str(self.camera_source) if source is None else str(source)
-            cap = cv2.VideoCapture(int(source))
-            if not cap.isOpened():
-                raise IOError(f"웹캠 {source}를 열 수 없습니다.")
+            if isinstance(source, list):
+                self.session = MultiCameraSession(source, **self.session_cfg)
+            else:
+                self.session = CameraSession(source, **self.session_cfg)
+            self.session.open()
         except Exception as e:
             print(f"카메라 초기화 오류: {e}")
+            self.session = None
+            return False
+        self.session.pause()
+        print(f"카메라 세션 시작: {source}")
+        return True
+
+    def pause_session(self):
+        if self.session is not None:
+            self.session.pause()
+
+    def resume_session(self):
+        if self.session is None or not self.session.is_opened():
+            if not self.start_session():
+                return False
+        self.session.resume()
+        return True
+
+    def prewarm(self):
+        """질문 분석 중에 카메라 캡처를 미리 시작해 두기 (run()은 이미 흐르는 프레임으로 바로 시작). 책이 필요 없으면 pause_session()"""
+        try:
+            return self.resume_session()
+        except Exception as e:
+            print(f"카메라 예열 오류: {e}")
+            return False
+
+    def close_session(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def stop(self):
+        """진행 중인 run()을 중단 (다른 스레드에서 호출)"""
+        self._cancel.set()
+
+    def run(self, source=None, conf_thres=0.6, iou_thres=0.45, max_det=1000, classes=None, agnostic_nms=False, headless=None,
+            on_capture=None):
+        """안정적인 문서가 감지되면 캡처 정보를 반환. on_capture를 주면 스캔 모드로 stop()까지 새 페이지마다 호출"""
+        headless = self.headless if headless is None else headless
+        self._cancel.clear()
+        self.last_error = None
+        # run() 시작부터 첫 결과/첫 검출/캡처까지 걸린 시간(초)
+        t_run = time.perf_counter()
+        self.run_timing = {'first_frame_s': None, 'first_detection_s': None, 'capture_s': None}
+        if source is not None:
+            source = normalize_source(source)
+            if self.session is None or str(self.session.source) != str(source):
+                self.camera_source = source
+                self.close_session()
+        if not self.resume_session():
+            self.last_error = "카메라를 열 수 없습니다."
             return None
+        session = self.session
 
-        detection_start_time = None
-        stable_bbox = None
-        STABILITY_SECONDS = 3.0
+        # 캡처(CameraSession) -> 추론(스레드) -> 판정/표시(현재 스레드) 단계를 bounded 큐로 연결
+        for stats in self.stage_stats.values():
+            stats.reset()
+        session.stats.reset()
+        self.result_queue = LatestQueue(maxsize=1, stats=self.stage_stats['display'])
+        stop_event = threading.Event()
+        infer_args = (conf_thres, iou_thres, classes, agnostic_nms, max_det)
+        infer_thread = threading.Thread(target=self._infer_worker, args=(session, stop_event, infer_args), daemon=True)
+        infer_thread.start()
+
+        num_views = len(session.source) if isinstance(session.source, list) else 1
+        self.trackers = [StabilityTracker(**self.tracker_cfg) for _ in range(num_views)]
+        self.best_frames = [BestFrameBuffer(size=self.best_frames_size) for _ in range(num_views)]
+        result = None
+        last_page = None
+        captures = 0
 
         print("문서/책을 카메라 앞에 놓아주세요...")
         print(" =======================================")
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        try:
+            while session.is_opened() and infer_thread.is_alive() and not self._cancel.is_set():
+                try:
+                    item = self.result_queue.get(timeout=0.05)
+                except queue.Empty:
+                    if not headless and cv2.waitKey(1) & 0xFF == 27:
+                        break
+                    continue
+                t0 = time.perf_counter()
+                frames, detections = item['frames'], item['detections']
+                if self.run_timing['first_frame_s'] is None:
+                    self.run_timing['first_frame_s'] = t0 - t_run
+                if any(detections) and self.run_timing['first_detection_s'] is None:
+                    self.run_timing['first_detection_s'] = t0 - t_run
 
-            im = letterbox(frame, self.imgsz, stride=self.stride, auto=self.pt)[0]
-            im = im.transpose((2, 0, 1))[::-1]
-            im = torch.from_numpy(im.copy()).to(self.device)
-            im = im.half() if self.model.fp16 else im.float()
-            im /= 255.0
-            if len(im.shape) == 3:
-                im = im[None]
+                now = time.time()
+                visible = []
+                for tracker, best_frames, frame, dets in zip(self.trackers, self.best_frames, frames, detections):
+                    tracks = tracker.update(dets, now)
+                    best_frames.prune(tracker.tracks)
+                    for track in tracks:
+                        if track.settled:
+                            best_frames.add(track, frame, sharpness(frame, track.bbox()))
+                    visible.append(tracks)
+                if any(tracker.stable_tracks(now) for tracker in self.trackers):
+                    if on_capture is None:
+                        print("\n안정적인 문서 감지 완료. 캡처 및 처리 시작.")
+                        self.run_timing['capture_s'] = time.perf_counter() - t_run
+                        result = self._select_view(frames, now)
+                        break
+                    # 스캔 모드: 안정 타이머를 다시 시작하고, 직전 캡처와 다른 페이지일 때만 내보냄 (페이지 넘김 감지)
+                    capture = self._select_view(frames, now)
+                    page = self._page_signature(capture)
+                    for tracker, best_frames in zip(self.trackers, self.best_frames):
+                        tracker.reset()
+                        best_frames.reset()
+                    if last_page is not None and self._same_page(last_page, page):
+                        continue
+                    last_page = page
+                    captures += 1
+                    if self.run_timing['capture_s'] is None:
+                        self.run_timing['capture_s'] = time.perf_counter() - t_run
+                    print(f"\n새 페이지 감지 ({captures}번째). 캡처 전달.")
+                    on_capture(capture)
+                    continue
 
-            pred = self.model(im, augment=False, visualize=False)
-            pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
+                # 원본 프레임은 OCR용으로 보존하고 표시용 사본에만 그림
+                views = []
+                for frame, tracks in zip(frames, visible):
+                    annotator = Annotator(frame.copy(), line_width=3, example=str(self.names))
+                    for track in tracks:
+                        label = f'{self.names[track.cls]} {track.conf:.2f}'
+                        annotator.box_label(track.bbox(), label, color=colors(track.cls, True))
+                    views.append(annotator.result())
+                im_display = tile_views(views)
+
+                font = cv2.FONT_HERSHEY_SIMPLEX
+                leading = [t for t in (tracker.leading_track() for tracker in self.trackers) if t is not None]
+                if leading:
+                    elapsed = max(t.elapsed(now) for t in leading)
+                    remaining = max(0, self.trackers[0].stability_seconds - elapsed)
+                    status_text = f"Document detection... {remaining:.1f}s remaining"
+                    cv2.putText(im_display, status_text, (10, 30), font, 1, (0, 255, 0), 2)
+                else:
+                    cv2.putText(im_display, "Searching for documents...", (10, 30), font, 1, (0, 0, 255), 2)
+
+                if headless:
+                    self.preview.publish(im_display)
+                else:
+                    cv2.imshow('Book Detection', im_display)
+                self.stage_stats['display'].add((time.perf_counter() - t0) * 1000)
+                self.stage_stats['end_to_end'].add((time.perf_counter() - item['t_capture']) * 1000)
 
-            detected = False
-            annotator = Annotator(frame, line_width=3, example=str(self.names))
-            
-            for i, det in enumerate(pred):
-                if len(det):
-                    det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], frame.shape).round()
-                    for *xyxy, conf, cls in reversed(det):
-                        class_name = self.names[int(cls)]
-                        if class_name.lower() == 'document' and conf >= conf_thres:
-                            detected = True
-                            current_bbox = [int(c) for c in xyxy]
-                            
-                            c = int(cls)
-                            label = f'{class_name} {conf:.2f}'
-                            annotator.box_label(xyxy, label, color=colors(c, True))
-                            
-                            if stable_bbox and self.is_stable(stable_bbox, current_bbox):
-                                if time.time() - detection_start_time >= STABILITY_SECONDS:
-                                    print("\n안정적인 문서 감지 완료. 캡처 및 처리 시작.")
-                                    cap.release()
-                                    cv2.destroyAllWindows()
-                                    return {'frame': frame, 'bbox': current_bbox}
-                            else:
-                                stable_bbox = current_bbox
-                                detection_start_time = time.time()
-                            break
-            
-            if not detected:
-                detection_start_time = None
-                stable_bbox = None
-
-            im_display = annotator.result()
-            
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            if detection_start_time:
-                elapsed = time.time() - detection_start_time
-                remaining = max(0, STABILITY_SECONDS - elapsed)
-                status_text = f"Document detection... {remaining:.1f}s remaining"
-                cv2.putText(im_display, status_text, (10, 30), font, 1, (0, 255, 0), 2)
+                if not headless:
+                    key = cv2.waitKey(1) & 0xFF
+                    if key == 27 or cv2.getWindowProperty('Book Detection', cv2.WND_PROP_VISIBLE) < 1:
+                        break
+        finally:
+            stop_event.set()
+            infer_thread.join(timeout=2.0)
+            session.pause()
+            if headless:
+                self.preview.clear()
             else:
-                cv2.putText(im_display, "Searching for documents...", (10, 30), font, 1, (0, 0, 255), 2)
-            
-            cv2.imshow('Book Detection', im_display)
+                cv2.destroyAllWindows()
+        if session.error:
+            # 죽은 세션은 닫아 두고 다음 run()에서 카메라를 다시 열도록 함
+            self.last_error = session.error
+            self.close_session()
 
-            key = cv2.waitKey(1) & 0xFF
-            if key == 27 or cv2.getWindowProperty('Book Detection', cv2.WND_PROP_VISIBLE) < 1:
-                break
-        
-        cap.release()
-        cv2.destroyAllWindows()
-        print("감지 종료.")
-        return None
+        stats = self.pipeline_stats()
+        print(f"파이프라인 통계: 캡처 {stats['capture']['avg_ms']:.1f}ms, 추론 {stats['infer']['avg_ms']:.1f}ms "
+              f"({stats['infer']['count']}회, 생략 {stats['gate']['dropped']}회), 표시 {stats['display']['avg_ms']:.1f}ms, "
+              f"버린 프레임 {stats['capture']['dropped']}")
+        if on_capture is not None:
+            print(f"스캔 종료: {captures}페이지 캡처.")
+            return None
+        if result is None:
+            print("감지 종료.")
+        return result
 
-    def is_stable(self, prev_box, curr_box, iou_threshold=0.7, center_threshold=30):
-        xA = max(prev_box[0], curr_box[0])
-        yA = max(prev_box[1], curr_box[1])
-        xB = min(prev_box[2], curr_box[2])
-        yB = min(prev_box[3], curr_box[3])
-        interArea = max(0, xB - xA) * max(0, yB - yA)
-        boxAArea = (prev_box[2] - prev_box[0]) * (prev_box[3] - prev_box[1])
-        boxBArea = (curr_box[2] - curr_box[0]) * (curr_box[3] - curr_box[1])
-        iou = interArea / float(boxAArea + boxBArea - interArea) if (boxAArea + boxBArea - interArea) > 0 else 0
-        
-        prev_center = ((prev_box[0] + prev_box[2]) / 2, (prev_box[1] + prev_box[3]) / 2)
-        curr_center = ((curr_box[0] + curr_box[2]) / 2, (curr_box[1] + curr_box[3]) / 2)
-        dist = ((prev_center[0] - curr_center[0]) ** 2 + (prev_center[1] - curr_center[1]) ** 2) ** 0.5
+    def scan(self, on_capture, **run_args):
+        """스캔 모드: stop()이 호출될 때까지 새 페이지가 안정될 때마다 on_capture(capture_info) 호출"""
+        return self.run(on_capture=on_capture, **run_args)
+
+    def _page_signature(self, capture):
+        x1, y1, x2, y2 = capture['bbox']
+        return page_hash(capture['frame'][max(0, y1):y2, max(0, x1):x2])
+
+    def _same_page(self, a, b, max_distance=56):
+        """두 페이지 해시(pHash, dHash)가 모두 max_distance 이내면 같은 페이지로 봄 (OCRCache와 같은 기준)"""
+        return all(bin(x ^ y).count('1') <= max_distance for x, y in zip(a, b))
 
+    def _select_view(self, frames, now):
+        """문서가 자리잡은 카메라들 중 선명도가 가장 높은 프레임을 골라 캡처 결과로 반환"""
+        candidates = []
+        for view, (tracker, best_frames, frame) in enumerate(zip(self.trackers, self.best_frames, frames)):
+            stable = tracker.stable_tracks(now)
+            track = stable[0] if stable else tracker.leading_track()
+            # 아직 안정 시간을 못 채운 카메라도 문서가 제자리에 보이면 후보로 비교
+            if track is None or track.missed or not track.settled:
+                continue
+            best = best_frames.best(track)
+            if best is None:
+                best = frame, track.bbox(), sharpness(frame, track.bbox())
+            candidates.append((best[2], bool(stable), view, best))
+        score, _, view, (best_frame, best_bbox, _) = max(candidates, key=lambda c: (c[0], c[1]))
+        if len(frames) > 1:
+            print(f"카메라 {view + 1}/{len(frames)} 선택")
+        print(f"선명도 최고 프레임 선택 (score={score:.1f})")
+        return {'frame': best_frame, 'bbox': best_bbox, 'sharpness': score, 'view': view}
+
+    def _infer_worker(self, session, stop_event, infer_args):
+        conf_thres, iou_thres, classes, agnostic_nms, max_det = infer_args
+        gates = None
+        last_detections = None
+        # grad 모드는 스레드별 설정이므로 추론 스레드 안에서 지정
+        with torch.inference_mode():
+            while not stop_event.is_set():
+                item = session.read(timeout=0.1)
+                if item is None:
+                    continue
+                frame_id, t_capture, frames = item
+                if not isinstance(frames, list):
+                    frames = [frames]
+                if gates is None:
+                    gates = [MotionGate(max_skip=self.gate_every) for _ in frames] if self.motion_gate else []
+
+                inferred = True
+                if gates:
+                    t0 = time.perf_counter()
+                    # 모든 카메라의 게이트를 갱신하고, 한 곳이라도 움직이면 묶음 전체를 다시 추론
+                    moved = [gate.check(frame) for gate, frame in zip(gates, frames)]
+                    inferred = any(moved) or last_detections is None
+                    self.stage_stats['gate'].add((time.perf_counter() - t0) * 1000)
+
+                if inferred:
+                    t0 = time.perf_counter()
+                    detections = self.detect_batch(frames, conf_thres, iou_thres, classes, agnostic_nms, max_det)
+                    self.stage_stats['infer'].add((time.perf_counter() - t0) * 1000)
+                    for gate in gates:
+                        gate.update()
+                    last_detections = detections
+                else:
+                    # 장면이 그대로면 마지막 박스를 전파 (안정성 타이머 의미는 동일)
+                    self.stage_stats['gate'].drop()
+                    detections = last_detections
+
+                self.result_queue.put_latest({
+                    'frame_id': frame_id,
+                    't_capture': t_capture,
+                    'frames': frames,
+                    'detections': detections,
+                    'inferred': inferred,
+                })
+
+    def detect(self, frame, conf_thres=0.6, iou_thres=0.45, classes=None, agnostic_nms=False, max_det=1000):
+        """프레임 한 장을 추론해 document 클래스 결과 [(bbox, conf, cls), ...]를 신뢰도 순으로 반환"""
+        return self.detect_batch([frame], conf_thres, iou_thres, classes, agnostic_nms, max_det)[0]
+
+    def detect_batch(self, frames, conf_thres=0.6, iou_thres=0.45, classes=None, agnostic_nms=False, max_det=1000):
+        """여러 카메라 프레임을 한 번의 배치 추론으로 처리해 프레임별 detect() 결과 목록을 반환"""
+        if self.doc_cls is None or (classes is not None and self.doc_cls not in classes):
+            return [[] for _ in frames]
+        preprocess = self.preprocess
+        if len(frames) > 1 and len({preprocess.geometry(f.shape[:2])[1] for f in frames}) > 1:
+            preprocess = self.square_preprocess
+        im = preprocess(frames)
+        pred = self.model(im, augment=False, visualize=False)
+        if self.postprocess == 'top1' and not agnostic_nms:
+            pred = single_class_top_nms(pred, self.doc_cls, conf_thres, iou_thres, max_det=max_det)
+        else:
+            pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
+
+        results = []
+        for det, frame in zip(pred, frames):
+            detections = []
+            if len(det):
+                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], frame.shape).round()
+                for x1, y1, x2, y2, conf, c in det.tolist():
+                    if int(c) == self.doc_cls and conf >= conf_thres:
+                        detections.append(([int(x1), int(y1), int(x2), int(y2)], conf, int(c)))
+            results.append(detections)
+        return results
+
+    def pipeline_stats(self):
+        """단계별 지연/처리량 카운터와 큐 깊이를 반환"""
+        stats = {name: s.snapshot() for name, s in self.stage_stats.items()}
+        stats['capture'] = self.session.stats.snapshot() if self.session is not None else StageStats().snapshot()
+        stats['queue_depth'] = {
+            'capture': self.session.queue_depth() if self.session is not None else 0,
+            'result': self.result_queue.qsize() if self.result_queue is not None else 0,
+        }
+        return stats
+
+    def is_stable(self, prev_box, curr_box, iou_threshold=0.7, center_threshold=30):
+        iou = box_iou(prev_box, curr_box)[0, 0]
+        dist = center_distance(prev_box, curr_box)[0, 0]
         return iou > iou_threshold and dist < center_threshold
@@ -0,0 +1,161 @@
+import time
+import random
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# httpx + h2가 설치되어 있으면 HTTP/2로 한 연결에서 요청을 다중화
+try:
+    import httpx
+    import h2  # noqa: F401
+except ImportError:
+    httpx = None
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class EndpointStats:
+    """엔드포인트별 호출 수, 실패, 재시도 횟수와 지연 시간(ms) 백분위"""
+    def __init__(self, window=512):
+        self._lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.failures = 0
+        self.retries = 0
+        self.last_status = None
+
+    def add(self, ms, status, retries):
+        with self._lock:
+            self.count += 1
+            self.samples.append(ms)
+            self.retries += retries
+            self.last_status = status
+            if status is None or status >= 400:
+                self.failures += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self.samples)
+        def pct(q):
+            return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'retries': self.retries,
+            'last_status': self.last_status,
+            'avg_ms': sum(samples) / len(samples) if samples else 0.0,
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95),
+            'max_ms': samples[-1] if samples else 0.0,
+        }
+
+
+class HttpClient:
+    """core/ 외부 호출이 공유하는 HTTP 클라이언트 (keep-alive 연결 풀, 지수 백오프 재시도, 엔드포인트별 타임아웃/지표)
+
+    - timeout: (연결, 읽기) 초. register()로 엔드포인트마다 따로 지정
+    - max_retries: 연결 오류, 타임아웃, 429/5xx 응답에 대한 최대 재시도 횟수
+    - backoff, max_backoff: 재시도 대기는 [0, min(max_backoff, backoff * 2^n)] 구간의 무작위 값 (Retry-After 우선)
+    """
+    def __init__(self, pool_size=10, max_retries=2, backoff=0.5, max_backoff=8.0, timeout=(3.05, 30), http2=True):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.http2 = http2 and httpx is not None
+        if self.http2:
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            self.session = httpx.Client(http2=True, limits=limits)
+            self._retry_errors = (httpx.TransportError,)
+        else:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self._retry_errors = (requests.ConnectionError, requests.Timeout)
+        self.endpoints = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, url, timeout=None, max_retries=None):
+        """이름으로 호출할 엔드포인트와 그 엔드포인트 전용 타임아웃/재시도 횟수를 등록"""
+        self.endpoints[name] = {
+            'url': url,
+            'timeout': timeout or self.timeout,
+            'max_retries': self.max_retries if max_retries is None else max_retries,
+        }
+
+    def _stats(self, name):
+        with self._lock:
+            if name not in self.stats:
+                self.stats[name] = EndpointStats()
+            return self.stats[name]
+
+    def _timeout(self, timeout):
+        if not self.http2:
+            return timeout
+        if isinstance(timeout, tuple):
+            return httpx.Timeout(timeout[1], connect=timeout[0])
+        return timeout
+
+    def _delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, endpoint, **kwargs):
+        """등록된 엔드포인트 이름 또는 URL로 요청. 재시도 후에도 오류 응답이면 그 응답을, 연결 실패면 예외를 돌려줌"""
+        config = self.endpoints.get(endpoint, {'url': endpoint, 'timeout': self.timeout, 'max_retries': self.max_retries})
+        timeout = self._timeout(kwargs.pop('timeout', config['timeout']))
+        stats = self._stats(endpoint)
+        t0 = time.perf_counter()
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self.session.request(method, config['url'], timeout=timeout, **kwargs)
+                if response.status_code not in RETRY_STATUS or attempt >= config['max_retries']:
+                    stats.add((time.perf_counter() - t0) * 1000, response.status_code, attempt)
+                    return response
+            except self._retry_errors as e:
+                if attempt >= config['max_retries']:
+                    stats.add((time.perf_counter() - t0) * 1000, None, attempt)
+                    raise
+                print(f"HTTP 재시도 ({endpoint}, {attempt + 1}/{config['max_retries']}): {e}")
+            else:
+                print(f"HTTP 재시도 ({endpoint}, {attempt + 1}/{config['max_retries']}): {response.status_code}")
+                response.close()
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    def get(self, endpoint, **kwargs):
+        return self.request('GET', endpoint, **kwargs)
+
+    def post(self, endpoint, **kwargs):
+        return self.request('POST', endpoint, **kwargs)
+
+    def metrics(self):
+        """엔드포인트별 지연/실패/재시도 통계"""
+        with self._lock:
+            stats = dict(self.stats)
+        return {name: s.snapshot() for name, s in stats.items()}
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """프로세스 전체에서 공유하는 HttpClient (첫 호출 시 생성)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 프로젝트 루트를 sys.path에 추가
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def sequence(*responses):
+    """호출될 때마다 responses를 차례로 돌려주고 마지막 응답을 반복하는 핸들러 (재시도 확인용)"""
+    lock = threading.Lock()
+    index = [0]
+
+    def handler(request):
+        with lock:
+            response = responses[min(index[0], len(responses) - 1)]
+            index[0] += 1
+        return response
+    return handler
+
+
+class StubServer:
+    """외부 API 대신 쓰는 로컬 HTTP 서버 (keep-alive 지원)
+
+    routes: {(method, path): handler}. handler(request)는 (status, body, headers) 또는 (status, body)를 반환하고,
+    body가 dict/list면 JSON으로 보낸다. request에는 method, path, headers, body가 들어 있다.
+    """
+    def __init__(self, routes=None, host='127.0.0.1', port=0, delay=0.0):
+        self.routes = dict(routes or {})
+        self.delay = delay
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # 헤더/본문 분할 전송 시 지연 ACK로 인한 40ms 대기 방지
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = {
+                    'method': self.command,
+                    'path': self.path,
+                    'headers': dict(self.headers),
+                    'body': self.rfile.read(length) if length else b'',
+                }
+                with stub._lock:
+                    stub.requests.append(request)
+                handler = stub.routes.get((self.command, self.path.split('?')[0]))
+                response = handler(request) if handler else (404, {'error': 'not found'})
+                status, body = response[0], response[1]
+                headers = dict(response[2]) if len(response) > 2 else {}
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                    headers.setdefault('Content-Type', 'application/json')
+                elif isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _handle
+            do_POST = _handle
+
+        return Handler
+
+    def url(self, path='/'):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    # HttpClient 재시도/연결 재사용 동작을 로컬에서 확인
+    from core.http_client import HttpClient
+
+    routes = {
+        ('POST', '/ok'): lambda request: (200, {'images': []}),
+        ('POST', '/flaky'): sequence((503, 'busy'), (502, 'bad gateway'), (200, {'images': []})),
+        ('POST', '/down'): lambda request: (503, 'busy', {'Retry-After': '0'}),
+    }
+    with StubServer(routes) as server:
+        client = HttpClient(backoff=0.05, http2=False)
+        client.register('ok', server.url('/ok'), timeout=(1, 5))
+        client.register('flaky', server.url('/flaky'), timeout=(1, 5), max_retries=3)
+        client.register('down', server.url('/down'), timeout=(1, 5), max_retries=1)
+        for _ in range(20):
+            assert client.post('ok', data=b'x').status_code == 200
+        assert client.post('flaky', data=b'x').status_code == 200
+        assert client.post('down', data=b'x').status_code == 503
+        print(f"요청 {len(server.requests)}회, 새 연결 {server.connections}회")
+        for name, s in client.metrics().items():
+            print(f"{name:>6}: n={s['count']} 실패 {s['failures']} 재시도 {s['retries']} "
+                  f"p50 {s['p50_ms']:.1f}ms p95 {s['p95_ms']:.1f}ms")
+        client.close()
@@ -1,38 +1,87 @@
 import os
 import cv2
-import sys
 import numpy as np
 from datetime import datetime
 import pytesseract
 from PIL import Image
 from dotenv import load_dotenv
-import requests
-import uuid
 import json
+import queue
+import threading
 import time
 
+from core.ocr_cache import OCRCache, page_hash
+from core.http_client import get_client
+from core.ocr_layout import layout_path
+from core.ocr_backends import ClovaBackend, HedgedOCR, TesseractBackend
+from core.page_prep import prepare_page
+
 load_dotenv()
 
 # Tesseract-OCR의 설치 경로를 지정
 #pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
-class InformSystem:
+class BackgroundWriter:
+    """디스크 저장을 전담하는 단일 스레드 (요청 경로에서 파일 I/O 제거, 임시 파일 후 원자적 이동)"""
     def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, path, data):
+        self._queue.put((path, data))
+
+    def _run(self):
+        while True:
+            path, data = self._queue.get()
+            try:
+                tmp_path = path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                print(f"이미지 저장 완료: {path}")
+            except Exception as e:
+                print(f"파일 저장 오류: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """대기 중인 저장이 모두 끝날 때까지 기다림 (종료 전 호출)"""
+        self._queue.join()
+
+
+class InformSystem:
+    def __init__(self, page_prep=True, use_cache=True, local_ocr=True):
         self.image_dir = "conversation/image"
         self.ocr_dir = "conversation/ocr"
         os.makedirs(self.image_dir, exist_ok=True)
         os.makedirs(self.ocr_dir, exist_ok=True)
+        # 같은 페이지를 다시 캡처하면 OCR 호출 없이 이전 결과를 재사용
+        self.ocr_cache = OCRCache("conversation/ocr_cache.jsonl") if use_cache else None
+        # 캡처 이미지는 메모리에서 인코딩해 바로 업로드하고 디스크 저장은 백그라운드로 처리
+        self.writer = BackgroundWriter()
+        # 업로드 전 페이지 펴기/글자 높이 기준 리샘플 (upload_stats에 업로드 크기와 OCR 지연 기록)
+        self.page_prep = page_prep
+        self.upload_stats = []
         
         self.clova_api_url = os.getenv("CLOVA_API_URL")
         self.clova_secret = os.getenv("CLOVA_SECRET_KEY")
         self.use_clova = bool(self.clova_api_url and self.clova_secret)
         
+        # 연결 재사용/재시도를 위해 core/ 공용 HTTP 클라이언트 사용 (OCR은 응답이 느려 읽기 타임아웃을 길게)
+        self.http = get_client()
+        self.clova = ClovaBackend(self.clova_api_url, self.clova_secret, self.http, timeout=(3.05, 30), max_retries=2)
+        # Clova가 hedge_after초 안에 끝나지 않으면 로컬 Tesseract를 함께 돌려 먼저 나온 결과 사용
+        self.local_ocr = TesseractBackend() if local_ocr else None
+        self.ocr = HedgedOCR(self.clova, self.local_ocr, hedge_after=1.5)
         if self.use_clova:
             print("Clova OCR 설정이 감지되었습니다.")
         else:
-            #print("Clova OCR 설정이 없음. Tesseract OCR만 사용.")
-            print("Clova OCR 설정이 없음. 프로그램을 종료.")
-            sys.exit()
+            print("Clova OCR 설정이 없음. 로컬 OCR만 사용.")
+        if self.ocr.available():
+            print(f"사용 OCR 엔진: {', '.join(self.ocr.engines())}")
+        else:
+            print("사용 가능한 OCR 엔진이 없음. 책 내용 없이 동작합니다.")
 
     def process_capture(self, capture_info):
         frame = capture_info['frame']
@@ -54,18 +103,44 @@ class InformSystem:
             print("이미지가 너무 작음.")
             # 다시 detect 시작하도록 설정 필요
             return None, None, None
+
+        hashes = page_hash(cropped_image) if self.ocr_cache is not None else None
+        cached = self.ocr_cache.get(hashes) if hashes is not None else None
+        if cached is not None:
+            return cached
                 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 스캔 모드에서는 같은 초에 여러 페이지가 처리될 수 있으므로 마이크로초까지 포함
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         image_filename = f"capture_{timestamp}.jpg"
         image_path = os.path.join(self.image_dir, image_filename)
         
-        cv2.imwrite(image_path, cropped_image, [cv2.IMWRITE_JPEG_QUALITY, 95])
-        print(f"이미지 저장 완료: {image_path}")
+        t0 = time.perf_counter()
+        page_image = cropped_image
+        if self.page_prep:
+            page_image, prep_info = prepare_page(cropped_image)
+            print(f"페이지 전처리: 펴기 {'성공' if prep_info['rectified'] else '생략'}, 글자 높이 {prep_info['text_height']}px, "
+                  f"배율 {prep_info['scale']:.2f}, {crop_width}x{crop_height} -> {page_image.shape[1]}x{page_image.shape[0]}")
+        ok, encoded = cv2.imencode('.jpg', page_image, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        if not ok:
+            print("이미지 인코딩 실패.")
+            return None, None, None
+        jpeg_bytes = encoded.tobytes()
+        self.writer.write(image_path, jpeg_bytes)
+        t1 = time.perf_counter()
 
         #ocr_text = self.perform_ocr(image_path)
-        ocr_text = self.perform_clova_ocr(image_path)
-        if ocr_text is None:
+        layout = self.ocr.recognize(jpeg_bytes)
+        self.upload_stats.append({
+            'bytes': len(jpeg_bytes),
+            'prep_ms': (t1 - t0) * 1000,
+            'ocr_ms': (time.perf_counter() - t1) * 1000,
+            'page_prep': self.page_prep,
+        })
+        print(f"OCR 업로드 {len(jpeg_bytes) / 1024:.0f}KB, 전처리+인코딩 {(t1 - t0) * 1000:.0f}ms, "
+              f"OCR {(time.perf_counter() - t1) * 1000:.0f}ms")
+        if layout is None:
             return None, image_path, None
+        ocr_text = layout['text']
 
         ocr_filename = f"ocr_{timestamp}.txt"
         ocr_path = os.path.join(self.ocr_dir, ocr_filename)
@@ -88,53 +163,61 @@ class InformSystem:
                 final_path = reserve_next_ocr_path(ocr_path)
                 os.replace(tmp_path, final_path)
             print(f"OCR 결과 저장 완료: {final_path}")
+            # 단어/줄/블록 위치를 보존한 구조화 결과를 같은 이름의 .json으로 저장 (프롬프트에 관련 문단만 보낼 때 사용)
+            json_path = layout_path(final_path)
+            with open(json_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(layout, f, ensure_ascii=False)
+            os.replace(json_path + ".tmp", json_path)
+            if self.ocr_cache is not None:
+                self.ocr_cache.put(hashes, ocr_text, image_path, final_path)
             return ocr_text, image_path, final_path
         except Exception as e:
             print(f"OCR 파일 저장 오류: {e}")
+            if self.ocr_cache is not None:
+                self.ocr_cache.put(hashes, ocr_text, image_path)
             return ocr_text, image_path, None
 
 
-    def perform_clova_ocr(self, image_path):
+    def perform_clova_ocr(self, image_source):
+        """image_source: JPEG 바이트 또는 이미지 파일 경로"""
+        layout = self.perform_clova_ocr_layout(image_source)
+        return layout['text'] if layout is not None else None
+
+    def perform_clova_ocr_layout(self, image_source):
+        """Clova OCR 결과를 줄/블록 구조(build_layout)로 반환, 실패하거나 글자가 없으면 None"""
         if not self.use_clova:
             return None
             
         try:
-            headers = {"X-OCR-SECRET": self.clova_secret}
-            payload = {
-                "version": "V2",
-                "requestId": str(uuid.uuid4()),
-                "timestamp": int(time.time() * 1000),
-                "images": [{"format": "jpg", "name": "document"}]
-            }
-            
-            with open(image_path, "rb") as image_file:
-                files = [
-                    ("file", image_file),
-                    ("message", (None, json.dumps(payload), "application/json"))
-                ]
-                
-                response = requests.post(self.clova_api_url, headers=headers, files=files, timeout=30)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    texts = []
-                    for image in data.get("images", []):
-                        for field in image.get("fields", []):
-                            text = field.get("inferText", "")
-                            if text.strip():
-                                texts.append(text.strip())
-                    
-                    result_text = " ".join(texts)
-                    print(f"Clova OCR 성공:\n{len(result_text)}자 추출")
-                    return result_text if result_text.strip() else None
-                else:
-                    print(f"Clova OCR 실패:\n{response.status_code}")
-                    return None
-                    
+            if isinstance(image_source, (bytes, bytearray)):
+                image_bytes = image_source
+            else:
+                with open(image_source, "rb") as image_file:
+                    image_bytes = image_file.read()
+            layout = self.clova.recognize(image_bytes)
+            if layout is None:
+                return None
+            print(f"Clova OCR 성공:\n{len(layout['text'])}자, {len(layout['lines'])}줄, {len(layout['blocks'])}블록 추출")
+            return layout if layout['text'].strip() else None
+
         except Exception as e:
             print(f"Clova OCR 오류:\n{e}")
             return None
 
+    def close(self):
+        self.writer.flush()
+        if self.ocr.wins:
+            print(f"OCR 엔진별 채택 횟수: {self.ocr.wins}")
+        if self.upload_stats:
+            n = len(self.upload_stats)
+            print(f"OCR {n}회 평균: 업로드 {sum(s['bytes'] for s in self.upload_stats) / n / 1024:.0f}KB, "
+                  f"OCR {sum(s['ocr_ms'] for s in self.upload_stats) / n:.0f}ms")
+        self.ocr.close()
+        metrics = self.http.metrics().get("clova_ocr")
+        if metrics and metrics['count']:
+            print(f"Clova OCR 호출 {metrics['count']}회: 평균 {metrics['avg_ms']:.0f}ms, p95 {metrics['p95_ms']:.0f}ms, "
+                  f"재시도 {metrics['retries']}회, 실패 {metrics['failures']}회")
+
     def perform_ocr(self, image_path):
         """
         # Clova OCR 시도
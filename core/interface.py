@@ -5,6 +5,8 @@ import os
 from pathlib import Path
 from datetime import datetime
 import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from core.config import SCREEN_WIDTH, SCREEN_HEIGHT, COLORS, BUTTON_FONT_SIZE, INPUT_FONT_SIZE
 
 
@@ -216,23 +218,46 @@ class TextInputBox:
 
     def get_text(self): return '\n'.join(self.text_lines)
     
+    def _wrap_line(self, line):
+        if not line: return ['']
+        words, current_line, lines = line.split(' '), '', []
+        for word in words:
+            test_line = current_line + (' ' + word if current_line else word)
+            if self.font.size(test_line)[0] <= self.text_area_width:
+                current_line = test_line
+            else:
+                if current_line: lines.append(current_line)
+                current_line = word
+        if current_line: lines.append(current_line)
+        return lines
+
     def set_text(self, text):
+        # 스트리밍 append_text()가 이어 붙일 마지막 문단과 그 시작 줄 번호
+        self._tail, self._tail_start = '', 0
         if not text: self.text_lines = ['']; return
         raw_lines, self.text_lines = text.split('\n'), []
         for line in raw_lines:
-            if not line: self.text_lines.append(''); continue
-            words, current_line = line.split(' '), ''
-            for word in words:
-                test_line = current_line + (' ' + word if current_line else word)
-                if self.font.size(test_line)[0] <= self.text_area_width:
-                    current_line = test_line
-                else:
-                    if current_line: self.text_lines.append(current_line)
-                    current_line = word
-            if current_line: self.text_lines.append(current_line)
+            self._tail, self._tail_start = line, len(self.text_lines)
+            self.text_lines.extend(self._wrap_line(line))
         if not self.text_lines: self.text_lines = ['']
         self.scroll_y, self.cursor_line, self.cursor_pos = 0, 0, 0
 
+    def append_text(self, text):
+        """스트리밍 응답 조각을 이어 붙이고 마지막 문단만 다시 줄바꿈. 맨 아래를 보고 있었으면 계속 따라 내려감"""
+        if not text: return
+        if not hasattr(self, '_tail'): self.set_text(self.get_text())
+        follow = self.scroll_y >= max(0, len(self.text_lines) - self.max_visible_lines)
+        parts = text.split('\n')
+        self._tail += parts[0]
+        lines = self.text_lines[:self._tail_start] + self._wrap_line(self._tail)
+        for part in parts[1:]:
+            self._tail, self._tail_start = part, len(lines)
+            lines.extend(self._wrap_line(part))
+        # 그리기 스레드가 중간 상태를 보지 않도록 목록을 한 번에 교체
+        self.text_lines = lines
+        if follow:
+            self.scroll_y = max(0, len(self.text_lines) - self.max_visible_lines)
+
 class ReadAIInterface:
     def __init__(self, ai_system, book_detector, voice_system, main_app):
         pygame.init()
@@ -251,6 +276,21 @@ class ReadAIInterface:
         self._tts_lock, self._tts_name_lock = threading.Lock(), threading.Lock()
         self._tts_counters = {}
         self.is_loading, self.loading_message, self._loading_tick = False, "", 0
+        self._preview_seq, self._preview_frame, self._preview_surface = 0, None, None
+        self._scan_wait_cancel = threading.Event()
+        # 질문 처리 스레드는 한 번에 하나만 (작업 내내 잠금 유지). 응답을 닫으면 세대 번호가 바뀌어 이전 작업은 화면을 건드리지 않음
+        self._question_busy = threading.Lock()
+        self._question_ids = itertools.count(1)
+        self._question_id = 0
+        # 추측 실행: 로컬 분류기가 애매해 LLM 판단이 필요할 때 카메라 예열과 책 없는 답변을 동시에 시작
+        self.speculative = False
+        # Gemini 응답을 생성되는 대로 응답 화면에 이어서 표시
+        self.streaming = True
+        self._speculation_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculate")
+        self.answer_times = []
+        self.preview_rect = pygame.Rect(SCREEN_WIDTH//2 - 400, 150, 800, 450)
+        if self.book_detector:
+            self.book_detector.preview.size = self.preview_rect.size
         self.setup_ui()
 
     def _play_file(self, path):
@@ -302,6 +342,8 @@ class ReadAIInterface:
 
     def _reset_to_start_screen(self):
         """Resets all conversation state and returns to the start screen."""
+        # 진행 중인 질문 작업이 있으면 더 이상 화면에 쓰지 않도록 세대를 넘김
+        self._question_id = next(self._question_ids)
         try:
             pygame.mixer.music.stop()
         except Exception:
@@ -337,36 +379,151 @@ class ReadAIInterface:
 
     def start_process_question(self):
         if self.is_loading: return
-        threading.Thread(target=self._process_question_worker, daemon=True).start()
-
-    def _process_question_worker(self):
+        self._question_id = question_id = next(self._question_ids)
+        if self._question_busy.locked():
+            # 닫은 응답의 작업이 아직 끝나지 않았으면 그 작업이 정리될 때까지 기다렸다가 시작
+            self.is_loading, self.loading_message = True, "이전 응답 정리 중"
+        threading.Thread(target=self._process_question_worker, args=(question_id, self.user_question), daemon=True).start()
+
+    def _is_current(self, question_id):
+        return question_id == self._question_id
+
+    def _answer_without_book(self, question):
+        edited_prompt, cache_text = self.ai_system.build_prompt(question)
+        return edited_prompt, self.ai_system.get_response(edited_prompt, question, cache_text)
+
+    def _judge_speculatively(self, question, scan):
+        """(책 필요 여부, 책 없는 답변 future 또는 None)
+
+        판단이 로컬에서 바로 끝나지 않으면 LLM 판단과 동시에 카메라를 켜고 책 없는 답변을 미리 요청한다.
+        책이 필요하면 답변은 버리고(아직 시작 전이면 취소), 필요 없으면 카메라를 다시 일시정지한다.
+        """
+        needs_book = self.ai_system.judge_question_local(question)
+        if needs_book is not None:
+            return needs_book, None
+        warm = scan is None and self.book_detector is not None
+        if warm:
+            # 열린 세션의 resume()은 즉시 끝나므로 바로 실행 (풀에 넣으면 이전 작업 뒤로 밀려 pause_session() 이후에 켜질 수 있음)
+            warm = self.book_detector.prewarm()
+        answer = self._speculation_pool.submit(self._answer_without_book, question)
+        needs_book = self.ai_system.judge_question(question)
+        if needs_book:
+            if not answer.cancel():
+                print("추측 답변 폐기 (책 내용 필요)")
+            return True, None
+        if warm:
+            self.book_detector.pause_session()
+        print("추측 답변 사용 (책 내용 불필요)")
+        return False, answer
+
+    def _stream_answer(self, edited_prompt, question, cache_text, t_start, question_id):
+        """첫 조각이 오면 바로 응답 화면으로 넘어가 조각마다 이어서 표시, 전체 응답 문자열 반환"""
+        parts = []
+        for chunk in self.ai_system.stream_response(edited_prompt, question, cache_text):
+            if not self._is_current(question_id):
+                # 사용자가 응답을 닫았으면 스트림을 끊고 화면에 더 쓰지 않음
+                break
+            if not parts:
+                print(f"첫 응답 조각까지 {time.perf_counter() - t_start:.2f}초")
+                self.response_display.set_text("")
+                self.current_screen = "response"
+                self.is_loading, self.loading_message = False, ""
+            parts.append(chunk)
+            self.response_display.append_text(chunk)
+        return "".join(parts).strip()
+
+    def _process_question_worker(self, question_id, question):
+        with self._question_busy:
+            if self._is_current(question_id):
+                self._answer_question(question_id, question)
+
+    def _answer_question(self, question_id, question):
+        t_start = time.perf_counter()
+        speculative_answer = None
         try:
-            needs_book = self.ai_system.judge_question(self.user_question)
+            if self.loading_message == "이전 응답 정리 중":
+                self.is_loading, self.loading_message = False, ""
+            scan = getattr(self.main_app, 'scan_session', None)
+            if self.speculative:
+                needs_book, speculative_answer = self._judge_speculatively(question, scan)
+            else:
+                needs_book = self.ai_system.judge_question(question)
+            judge_source = self.ai_system.last_judge_source
             ocr_text, image_path, ocr_path = None, None, None
-            if needs_book:
+            if needs_book and scan is None:
+                # 후속 질문이면 직전에 참고한 페이지를 다시 읽어 씀 (없으면 (None, None))
+                ocr_text, ocr_path = self.ai_system.followup_page(question)
+            if needs_book and scan is not None:
+                # 스캔 모드: 이미 OCR된 페이지들로 바로 답하고, 아직 페이지가 없으면 첫 페이지를 기다림
+                if len(scan.store) == 0:
+                    self.current_screen = "ocr_guide"
+                    self.is_loading = False
+                self._scan_wait_cancel.clear()
+                if not scan.wait(min_pages=1, cancel=self._scan_wait_cancel):
+                    print("스캔 대기가 중단되었습니다. 시작 화면으로 돌아갑니다.")
+                    if self._is_current(question_id):
+                        self._reset_to_start_screen()
+                    return
+                ocr_text, image_path, ocr_path = scan.store.snapshot()
+            elif needs_book and ocr_path is not None:
+                # 후속 질문: 직전에 참고한 페이지와 책 색인으로 답하고 다시 캡처하지 않음 (예열한 카메라는 다시 일시정지)
+                print(f"후속 질문: 이전 페이지로 답변 (캡처 생략, {ocr_path})")
+                if self.book_detector:
+                    self.book_detector.pause_session()
+            elif needs_book:
                 self.current_screen = "ocr_guide"
                 self.is_loading = False
-                capture_info = self.book_detector.run()
+                capture_info = self.book_detector.run(**getattr(self, 'detect_run_args', {}))
+                if not self._is_current(question_id):
+                    return
+                if capture_info is None and self.book_detector.last_error:
+                    # 카메라 분리 등으로 감지가 끝났으면 안내 화면에 머무르지 않고 오류를 보여 줌
+                    self.ai_response = f"[카메라 오류: {self.book_detector.last_error}]"
+                    self.response_display.set_text(self.ai_response)
+                    self.current_screen = "response"
+                    return
                 if capture_info is None:
                     print("책 감지가 중단되었습니다. 시작 화면으로 돌아갑니다.")
                     self._reset_to_start_screen()
                     return
                 ocr_text, image_path, ocr_path = self.main_app.inform_system.process_capture(capture_info)
+            if not self._is_current(question_id):
+                return
             self.is_loading, self.loading_message = True, "AI 응답 생성 중"
-            edited_prompt = self.ai_system.create_prompt(self.user_question, ocr_text)
-            self.ai_response = self.ai_system.get_response(edited_prompt)
+            if speculative_answer is not None:
+                edited_prompt, answer = speculative_answer.result()
+            elif self.streaming:
+                edited_prompt, cache_text = self.ai_system.build_prompt(question, ocr_text, ocr_path)
+                answer = self._stream_answer(edited_prompt, question, cache_text, t_start, question_id)
+            else:
+                edited_prompt, cache_text = self.ai_system.build_prompt(question, ocr_text, ocr_path)
+                answer = self.ai_system.get_response(edited_prompt, question, cache_text)
+            if not self._is_current(question_id):
+                # 응답을 닫았으면 (스트림 중간에 끊긴) 답변은 기억/저장/재생하지 않고 다른 화면으로 옮기지도 않음
+                print("닫은 질문의 응답은 버립니다.")
+                return
+            self.ai_response = answer
+            self.ai_system.remember(question, self.ai_response, ocr_text, ocr_path)
+            self.answer_times.append(time.perf_counter() - t_start)
+            print(f"응답까지 {self.answer_times[-1]:.2f}초 (책 {'필요' if needs_book else '불필요'}, 중앙값 {sorted(self.answer_times)[len(self.answer_times) // 2]:.2f}초)")
             voice_path = getattr(self, 'voice_file_path', None)
-            self.main_app.save_conversation(self.user_question, edited_prompt, self.ai_response, image_path, ocr_path, voice_path)
-            self.response_display.set_text(self.ai_response)
+            self.main_app.save_conversation(question, edited_prompt, self.ai_response, image_path, ocr_path, voice_path,
+                                            judge_source, needs_book)
+            # 스트리밍으로 이미 표시했으면 스크롤 위치를 유지하도록 다시 설정하지 않음
+            if self.current_screen != "response":
+                self.response_display.set_text(self.ai_response)
             self.current_screen = "response"
             if getattr(self.main_app, 'tts_enabled', False) and self.ai_response and self.voice_system:
                 threading.Thread(target=self._tts_worker, args=(self.ai_response, self._reserve_next_tts_path()), daemon=True).start()
         except Exception as e:
             print(f"process_question 오류(스레드): {e}")
-            self.ai_response = f"[AI 오류: {e}]"
-            self.response_display.set_text(self.ai_response)
-            self.current_screen = "response"
-        finally: self.is_loading, self.loading_message = False, ""
+            if self._is_current(question_id):
+                self.ai_response = f"[AI 오류: {e}]"
+                self.response_display.set_text(self.ai_response)
+                self.current_screen = "response"
+        finally:
+            if self._is_current(question_id):
+                self.is_loading, self.loading_message = False, ""
 
     def start_finish_recording(self):
         if self.is_loading: return
@@ -418,7 +575,9 @@ class ReadAIInterface:
         while running:
             dt = self.clock.tick(60)
             for event in pygame.event.get():
-                if event.type == pygame.QUIT: running = False
+                if event.type == pygame.QUIT:
+                    running = False
+                    if self.book_detector: self.book_detector.stop()
                 self.handle_events(event)
             if (self.current_screen == "voice_input" and self.voice_system and self.voice_system.is_recording):
                 self.voice_system.record_chunk()
@@ -426,11 +585,19 @@ class ReadAIInterface:
             if self.current_screen == "response": self.response_display.update(dt)
             if self.is_loading: self._loading_tick = (self._loading_tick + 1) % 40
             self.draw_screen()
+        # 스캔 중인 페이지의 OCR이 끝나야 OCR 풀과 이미지 저장을 닫을 수 있음
+        self.main_app.stop_scan()
+        if self.book_detector:
+            self.book_detector.close_session()
+        self._speculation_pool.shutdown(wait=False, cancel_futures=True)
+        # 백그라운드로 저장 중인 캡처 이미지가 남지 않도록 대기
+        self.main_app.inform_system.close()
+        self.ai_system.close()
         pygame.quit()
         sys.exit()
 
     def handle_events(self, event):
-        handlers = {"start": self.handle_start, "question_method": self.handle_method, "text_input": self.handle_text, "voice_input": self.handle_voice, "response": self.handle_response}
+        handlers = {"start": self.handle_start, "question_method": self.handle_method, "text_input": self.handle_text, "voice_input": self.handle_voice, "ocr_guide": self.handle_ocr, "response": self.handle_response}
         if self.current_screen in handlers: handlers[self.current_screen](event)
 
     def handle_start(self, event):
@@ -483,6 +650,15 @@ class ReadAIInterface:
             self.voice_stt_display.set_text("")
             self.current_screen = "question_method"
 
+    def handle_ocr(self, event):
+        if self.buttons['back'].handle_event(event) or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+            if getattr(self.main_app, 'scan_session', None) is not None:
+                # 스캔은 계속 돌리고 페이지 대기만 취소
+                self._scan_wait_cancel.set()
+                return
+            # 감지 루프가 None을 반환하며 종료되고 작업 스레드가 시작 화면으로 되돌림
+            self.book_detector.stop()
+
     def handle_response(self, event):
         self.response_display.handle_event(event)
         if self.buttons['resp_ok'].handle_event(event):
@@ -537,10 +713,26 @@ class ReadAIInterface:
         self.buttons['v_complete'].draw(self.screen)
         self.buttons['back'].draw(self.screen)
 
+    def _update_preview_surface(self):
+        seq, frame = self.book_detector.preview.get(self._preview_seq)
+        if seq == self._preview_seq: return
+        self._preview_seq = seq
+        if frame is None or not frame.flags['C_CONTIGUOUS']:
+            self._preview_frame, self._preview_surface = None, None
+            return
+        # 감지기 버퍼를 복사 없이 Surface로 감싸기 위해 배열 참조를 함께 유지
+        self._preview_frame = frame
+        self._preview_surface = pygame.image.frombuffer(frame.data, (frame.shape[1], frame.shape[0]), 'BGR')
+
     def draw_ocr(self):
-        self.draw_title("카메라에 책의 내용이 뜨도록 해주십시오", SCREEN_HEIGHT//2)
-        text = self.font_small.render("5초 이상 감지되면 자동으로 캡처됩니다.", True, COLORS['GRAY'])
-        self.screen.blit(text, text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 50)))
+        self.draw_title("카메라에 책의 내용이 뜨도록 해주십시오", 100)
+        if self.book_detector: self._update_preview_surface()
+        if self._preview_surface is not None:
+            self.screen.blit(self._preview_surface, self._preview_surface.get_rect(center=self.preview_rect.center))
+            pygame.draw.rect(self.screen, COLORS['BLACK'], self.preview_rect, 2)
+        text = self.font_small.render("책이 안정적으로 감지되면 자동으로 캡처됩니다.", True, COLORS['GRAY'])
+        self.screen.blit(text, text.get_rect(center=(SCREEN_WIDTH//2, self.preview_rect.bottom + 30)))
+        self.buttons['back'].draw(self.screen)
 
     def draw_response(self):
         self.draw_title("AI 응답", 100)
@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# 프로젝트 루트를 sys.path에 추가
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 상대 경로(--images, --json) 해석용으로 작업 디렉토리를 바꾸기 전에 저장
+LAUNCH_DIR = os.getcwd()
+
+from core.clova_stub import ClovaStub
+
+
+def synthetic_page(seed, width=900, height=1200):
+    """밝은 종이에 글줄이 있는 가짜 페이지 (페이지마다 다른 내용)"""
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width, 3), 235, np.uint8)
+    for i in range(30):
+        y = 60 + i * 36
+        x = 50
+        while x < width - 120:
+            w = int(rng.integers(20, 90))
+            cv2.rectangle(page, (x, y), (x + w, y + 18), (30, 30, 30), -1)
+            x += w + 14
+    return page
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def run_load(inform_system, captures, requests, concurrency):
+    """process_capture를 concurrency개 스레드로 requests번 호출해 지연/성공 여부를 모음"""
+    def one(i):
+        t0 = time.perf_counter()
+        try:
+            ocr_text, _, _ = inform_system.process_capture(captures[i % len(captures)])
+            ok = ocr_text is not None
+        except Exception as e:
+            print(f"요청 {i} 오류: {e}")
+            ok = False
+        return (time.perf_counter() - t0) * 1000, ok
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - t0
+    latencies = [ms for ms, _ in results]
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'success': sum(ok for _, ok in results),
+        'wall_s': wall,
+        'throughput_rps': requests / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': max(latencies, default=0.0),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Clova 대체 서버로 InformSystem.process_capture 부하 테스트")
+    parser.add_argument('--requests', type=int, default=50, help='총 요청 수 (기본값: 50)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8], help='동시 요청 수 목록 (기본값: 1 4 8)')
+    parser.add_argument('--url', type=str, default=None, help='이미 실행 중인 대체 서버 URL (없으면 내부에서 실행)')
+    parser.add_argument('--secret', type=str, default='stub-secret', help='X-OCR-SECRET 값')
+    parser.add_argument('--latency', type=float, default=1.0, help='내부 서버 평균 지연(초) (기본값: 1.0)')
+    parser.add_argument('--jitter', type=float, default=0.2, help='내부 서버 지연 표준편차(초) (기본값: 0.2)')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='내부 서버 500/503 비율 (기본값: 0)')
+    parser.add_argument('--images', type=str, default=None, help='입력 이미지 폴더 (없으면 합성 페이지 사용)')
+    parser.add_argument('--pages', type=int, default=8, help='합성 페이지 수 (기본값: 8)')
+    parser.add_argument('--no_page_prep', action='store_true', help='페이지 펴기/리샘플 생략')
+    parser.add_argument('--json', type=str, default=None, help='결과를 저장할 JSON 경로')
+    args = parser.parse_args()
+
+    if args.images:
+        folder = os.path.join(LAUNCH_DIR, args.images)
+        frames = [cv2.imread(os.path.join(folder, f)) for f in sorted(os.listdir(folder))]
+        frames = [f for f in frames if f is not None]
+    else:
+        frames = [synthetic_page(i) for i in range(args.pages)]
+    captures = [{'frame': f, 'bbox': [0, 0, f.shape[1], f.shape[0]]} for f in frames]
+
+    stub = None
+    if args.url is None:
+        stub = ClovaStub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, secret=args.secret).start()
+    os.environ['CLOVA_API_URL'] = args.url or stub.url
+    os.environ['CLOVA_SECRET_KEY'] = args.secret
+
+    # 캡처/OCR 파일이 실제 conversation/ 폴더에 쌓이지 않도록 임시 디렉토리에서 실행
+    workdir = tempfile.mkdtemp(prefix="ocr_load_")
+    os.chdir(workdir)
+    print(f"작업 디렉토리: {workdir}")
+    from core.inform_sys import InformSystem
+    # 같은 이미지를 반복 전송하므로 캐시를 끄고, Clova 경로만 측정하도록 로컬 OCR도 끔
+    inform = InformSystem(page_prep=not args.no_page_prep, use_cache=False, local_ocr=False)
+
+    results = []
+    for concurrency in args.concurrency:
+        result = run_load(inform, captures, args.requests, concurrency)
+        # HTTP 지표는 누적값 (앞 단계 포함)
+        result['http'] = inform.http.metrics().get('clova_ocr')
+        results.append(result)
+    inform.close()
+    if stub is not None:
+        print(f"대체 서버 응답: {stub.counts}")
+        stub.stop()
+
+    print("\n동시성 | 성공/요청 | 처리량 | p50 | p95 | p99 | max")
+    for r in results:
+        print(f"{r['concurrency']:>6} | {r['success']:>4}/{r['requests']:<4} | {r['throughput_rps']:.2f} req/s | "
+              f"{r['p50_ms']:.0f}ms | {r['p95_ms']:.0f}ms | {r['p99_ms']:.0f}ms | {r['max_ms']:.0f}ms")
+    if args.json:
+        with open(os.path.join(LAUNCH_DIR, args.json), 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+        print(f"결과 저장 완료: {args.json}")
@@ -3,6 +3,7 @@ import os
 import json
 from datetime import datetime
 import argparse
+import threading
 
 # 프로젝트 루트를 sys.path에 추가
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -10,20 +11,28 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from core.ai_system import AISystem
 from core.detect_sys import BookDetector
 from core.inform_sys import InformSystem
+from core.scan import ScanSession
 from core.voice_sys import VoiceSystem
 from core.interface import ReadAIInterface
 
 class MainApp:
-    def __init__(self, camera_source=0, mic=None, tts_enabled=False, tts_voice=None):
+    def __init__(self, camera_source=0, mic=None, tts_enabled=False, tts_voice=None, memory_tokens=600, book=None):
         self.conversation_file = "conversation/record.json"
         self.camera_source = camera_source
         self.initialize_records()
 
-        self.ai_system = AISystem()
+        self.ai_system = AISystem(memory_tokens=memory_tokens, book_id=book)
         self.inform_system = InformSystem()
-        self.book_detector = BookDetector(inform_system=self.inform_system, camera_source=camera_source)
+        # 미리보기는 pygame 창에 직접 그리므로 OpenCV 창 없이(headless) 실행
+        self.book_detector = BookDetector(inform_system=self.inform_system, camera_source=camera_source, headless=True)
+        # 카메라는 한 번만 열어 두고 질문 사이에는 일시정지 상태로 유지
+        self.book_detector.start_session()
         self.voice_system = VoiceSystem(input_device_index=mic)
 
+        # 스캔 모드에서 페이지별 OCR 결과를 모으는 세션 (start_scan()으로 시작)
+        self.scan_session = None
+        self.scan_thread = None
+
         self.tts_enabled = tts_enabled
         self.tts_voice = tts_voice
         if self.tts_voice:
@@ -41,13 +50,33 @@ class MainApp:
             print(f"인터페이스 초기화 실패: {e}")
             self.interface = None
 
+    def start_scan(self, run_args=None, workers=2):
+        """스캔 모드 시작: 감지 루프를 백그라운드에서 계속 돌리며 새 페이지마다 OCR 작업자 풀에 넘김"""
+        self.scan_session = ScanSession(self.inform_system, workers=workers)
+        self.scan_thread = threading.Thread(target=self.book_detector.scan, args=(self.scan_session.submit,),
+                                            kwargs=run_args or {}, daemon=True)
+        self.scan_thread.start()
+        print(f"스캔 모드 시작 (OCR 작업자 {workers}개)")
+
+    def stop_scan(self, timeout=5.0):
+        """감지 루프를 멈추고, 이미 넘긴 페이지의 OCR이 끝날 때까지 기다림 (inform_system.close() 전에 호출)"""
+        if self.scan_thread is not None:
+            self.book_detector.stop()
+            self.scan_thread.join(timeout=timeout)
+            if self.scan_thread.is_alive():
+                print("스캔 감지 루프가 제시간에 끝나지 않았습니다.")
+            self.scan_thread = None
+        if self.scan_session is not None:
+            self.scan_session.close()
+
     def initialize_records(self):
         os.makedirs(os.path.dirname(self.conversation_file), exist_ok=True)
         if not os.path.exists(self.conversation_file):
             with open(self.conversation_file, 'w', encoding='utf-8') as f:
                 json.dump({"total_conversations": 0, "records": []}, f, indent=4)
 
-    def save_conversation(self, user_prompt, edited_prompt, ai_response, image_path=None, ocr_path=None, voice_path=None):
+    def save_conversation(self, user_prompt, edited_prompt, ai_response, image_path=None, ocr_path=None, voice_path=None,
+                          judge_source=None, needs_book=None):
         try:
             with open(self.conversation_file, 'r+', encoding='utf-8') as f:
                 data = json.load(f)
@@ -59,7 +88,10 @@ class MainApp:
                     "ai_response": ai_response,
                     "image_path": image_path,
                     "ocr_text_path": ocr_path,
-                    "voice_path": voice_path
+                    "voice_path": voice_path,
+                    # 책 필요 여부를 누가 판단했는지 ('llm', 'local'). 로컬 분류기는 LLM 판단 기록으로만 다시 학습
+                    "judge_source": judge_source,
+                    "needs_book": needs_book
                 }
                 data["records"].append(new_record)
                 data["total_conversations"] += 1
@@ -71,7 +103,7 @@ class MainApp:
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="일짜곰 메인 애플리케이션")
-    parser.add_argument('--source', type=int, default=0, help='카메라 소스 인덱스 (기본값: 0)')
+    parser.add_argument('--source', type=int, nargs='+', default=[0], help='카메라 소스 인덱스, 여러 개면 함께 감지 (기본값: 0)')
     parser.add_argument('--conf_thres', type=float, default=0.7, help='감지 신뢰도 임계값 (기본값: 0.7)')
     parser.add_argument('--iou_thres', type=float, default=0.45, help='NMS IoU 임계값 (기본값: 0.45)')
     parser.add_argument('--max_det', type=int, default=1, help='이미지당 최대 감지 개수 (기본값: 1)')
@@ -80,6 +112,11 @@ if __name__ == '__main__':
     parser.add_argument('--mic', type=int, default=-1, help='사용할 마이크 장치 번호 (기본값: -1, 시스템 기본 장치)')
     parser.add_argument('--tts', action='store_true', help='AI 응답 시 자동으로 TTS 재생')
     parser.add_argument('--tts-v', type=str, default=None, help='TTS 재생에 사용할 목소리 이름')
+    parser.add_argument('--scan', action='store_true', help='스캔 모드: 페이지를 넘길 때마다 자동 캡처/OCR 후 여러 페이지로 답변')
+    parser.add_argument('--scan_workers', type=int, default=2, help='스캔 모드 동시 OCR 작업자 수 (기본값: 2)')
+    parser.add_argument('--speculative', action='store_true', help='질문 분석이 LLM까지 가면 카메라 예열과 책 없는 답변을 동시에 시작')
+    parser.add_argument('--book', type=str, default=None, help='책 이름: 같은 이름이면 이전 실행에서 캡처한 페이지도 검색 (기본값: 실행마다 새 책)')
+    parser.add_argument('--memory_tokens', type=int, default=600, help='후속 질문용 이전 대화 문맥 토큰 예산, 0이면 사용 안 함 (기본값: 600)')
     
     args = parser.parse_args()
 
@@ -97,7 +134,9 @@ if __name__ == '__main__':
         camera_source=args.source, 
         mic=selected_mic, 
         tts_enabled=args.tts, 
-        tts_voice=args.tts_v
+        tts_voice=args.tts_v,
+        memory_tokens=args.memory_tokens,
+        book=args.book
     )
 
     if app.interface:
@@ -109,6 +148,9 @@ if __name__ == '__main__':
             'classes': args.classes,
             'agnostic_nms': args.agnostic_nms
         }
+        app.interface.speculative = args.speculative
+        if args.scan:
+            app.start_scan(app.interface.detect_run_args, workers=args.scan_workers)
         app.interface.run()
     else:
         print("Pygame 인터페이스를 시작할 수 없습니다. 프로그램을 종료합니다.")
\ No newline at end of file
@@ -0,0 +1,222 @@
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+from core.ocr_layout import build_layout
+
+
+class OCRBackend:
+    """OCR 엔진 공통 인터페이스. recognize(JPEG 바이트)는 build_layout 형식의 결과 또는 None을 반환"""
+    name = "base"
+
+    def available(self):
+        return True
+
+    def recognize(self, image_bytes):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ClovaBackend(OCRBackend):
+    """네이버 Clova OCR V2 (공용 HttpClient의 'clova_ocr' 엔드포인트 사용)"""
+    name = "clova"
+
+    def __init__(self, api_url, secret, http, timeout=(3.05, 30), max_retries=2):
+        self.api_url = api_url
+        self.secret = secret
+        self.http = http
+        if self.available():
+            self.http.register("clova_ocr", api_url, timeout=timeout, max_retries=max_retries)
+
+    def available(self):
+        return bool(self.api_url and self.secret)
+
+    def recognize(self, image_bytes):
+        headers = {"X-OCR-SECRET": self.secret}
+        payload = {
+            "version": "V2",
+            "requestId": str(uuid.uuid4()),
+            "timestamp": int(time.time() * 1000),
+            "images": [{"format": "jpg", "name": "document"}]
+        }
+        files = [
+            ("file", ("document.jpg", image_bytes, "image/jpeg")),
+            ("message", (None, json.dumps(payload), "application/json"))
+        ]
+        response = self.http.post("clova_ocr", headers=headers, files=files)
+        if response.status_code != 200:
+            print(f"Clova OCR 실패:\n{response.status_code}")
+            return None
+        return build_layout(response.json())
+
+
+def _tesseract_worker(image_bytes, lang):
+    """프로세스 풀에서 실행: CLAHE 보정 후 Tesseract 단어 박스를 Clova 형식 필드로 바꿔 build_layout에 전달"""
+    import pytesseract
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    image = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8)).apply(image)
+    data = pytesseract.image_to_data(image, lang=lang, config='--psm 6 --oem 3', output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data['text']):
+        if text.strip() and float(data['conf'][i]) >= 0:
+            words.append(i)
+    fields = []
+    for k, i in enumerate(words):
+        line_id = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        nxt = words[k + 1] if k + 1 < len(words) else None
+        next_id = (data['block_num'][nxt], data['par_num'][nxt], data['line_num'][nxt]) if nxt is not None else None
+        x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
+        fields.append({
+            'inferText': data['text'][i],
+            'inferConfidence': float(data['conf'][i]) / 100,
+            'boundingPoly': {'vertices': [{'x': x, 'y': y}, {'x': x + w, 'y': y}, {'x': x + w, 'y': y + h}, {'x': x, 'y': y + h}]},
+            'lineBreak': next_id != line_id,
+        })
+    return build_layout({'images': [{'fields': fields}]})
+
+
+def _noop():
+    return True
+
+
+class TesseractBackend(OCRBackend):
+    """로컬 Tesseract OCR. GIL과 UI 스레드에 영향을 주지 않도록 별도 프로세스 풀에서 실행"""
+    name = "tesseract"
+
+    def __init__(self, processes=1, lang=None):
+        self.processes = processes
+        self.lang = lang
+        self._pool = None
+        self._available = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        if self._available is None:
+            try:
+                import pytesseract
+                pytesseract.get_tesseract_version()
+                if self.lang is None:
+                    self.lang = 'kor+eng' if 'kor' in pytesseract.get_languages() else 'eng'
+                self._available = True
+            except Exception:
+                self._available = False
+        return self._available
+
+    def warmup(self):
+        """프로세스 시작 비용을 첫 OCR 전에 미리 지불"""
+        self._get_pool().submit(_noop)
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            return self._pool
+
+    def submit(self, image_bytes):
+        return self._get_pool().submit(_tesseract_worker, image_bytes, self.lang)
+
+    def recognize(self, image_bytes):
+        return self.submit(image_bytes).result()
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+class HedgedOCR:
+    """주 엔진(Clova)과 보조 엔진(로컬)을 경쟁시켜 먼저 도착한 '쓸 만한' 결과를 사용
+
+    - hedge_after: 주 엔진이 이 시간(초) 안에 끝나지 않으면 보조 엔진 시작 (0이면 처음부터 동시 실행)
+    - min_chars: 이보다 짧은 결과는 쓸 만하지 않은 것으로 보고 다른 엔진 결과를 기다림
+    - timeout: 전체 대기 상한(초)
+    둘 중 한 엔진만 사용 가능하면 그 엔진만 사용한다 (오프라인이면 로컬 엔진만).
+    """
+    def __init__(self, primary=None, secondary=None, hedge_after=1.5, min_chars=10, timeout=35.0):
+        self.primary = primary if primary is not None and primary.available() else None
+        self.secondary = secondary if secondary is not None and secondary.available() else None
+        self.hedge_after = hedge_after
+        self.min_chars = min_chars
+        self.timeout = timeout
+        self._threads = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ocr")
+        self.wins = {}
+        if isinstance(self.secondary, TesseractBackend):
+            self.secondary.warmup()
+
+    def available(self):
+        return self.primary is not None or self.secondary is not None
+
+    def engines(self):
+        return [e.name for e in (self.primary, self.secondary) if e is not None]
+
+    def _start(self, engine, image_bytes):
+        if isinstance(engine, TesseractBackend):
+            return engine.submit(image_bytes)
+        return self._threads.submit(engine.recognize, image_bytes)
+
+    def _acceptable(self, layout):
+        return layout is not None and len(layout['text'].strip()) >= self.min_chars
+
+    def recognize(self, image_bytes):
+        """먼저 끝난 쓸 만한 결과(build_layout 형식, 'engine' 키 포함) 또는 None"""
+        if not self.available():
+            print("사용 가능한 OCR 엔진이 없습니다.")
+            return None
+        t0 = time.perf_counter()
+        deadline = t0 + self.timeout
+        pending = {}
+        first = self.primary or self.secondary
+        pending[self._start(first, image_bytes)] = first
+        backup = self.secondary if first is self.primary else None
+        if backup is not None and self.hedge_after <= 0:
+            pending[self._start(backup, image_bytes)] = backup
+            backup = None
+
+        fallback = None
+        while pending:
+            wait_for = deadline - time.perf_counter()
+            if backup is not None:
+                wait_for = min(wait_for, t0 + self.hedge_after - time.perf_counter())
+            done, _ = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+            for future in done:
+                engine = pending.pop(future)
+                try:
+                    layout = future.result()
+                except Exception as e:
+                    print(f"{engine.name} OCR 오류:\n{e}")
+                    layout = None
+                if self._acceptable(layout):
+                    for other in pending:
+                        other.cancel()
+                    layout['engine'] = engine.name
+                    self.wins[engine.name] = self.wins.get(engine.name, 0) + 1
+                    print(f"{engine.name} OCR 결과 사용 ({(time.perf_counter() - t0) * 1000:.0f}ms)")
+                    return layout
+                if layout is not None and fallback is None:
+                    fallback = dict(layout, engine=engine.name)
+            # 주 엔진이 느리거나 쓸 만한 결과를 못 주면 보조 엔진 시작
+            if backup is not None and (not pending or time.perf_counter() - t0 >= self.hedge_after):
+                print(f"{first.name} OCR 지연/실패, {backup.name} OCR 병행 시작")
+                pending[self._start(backup, image_bytes)] = backup
+                backup = None
+            elif not done and time.perf_counter() >= deadline:
+                print("OCR 시간 초과")
+                break
+        return fallback
+
+    def close(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        for engine in (self.primary, self.secondary):
+            if engine is not None:
+                engine.close()
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def dhash(image, size=16):
+    """가로 인접 픽셀 밝기 차이로 만든 size*size 비트 difference hash (정수)"""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def phash(image, size=16, scale=4):
+    """저주파 DCT 계수가 중앙값보다 큰지로 만든 size*size 비트 perceptual hash (정수)"""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    n = size * scale
+    small = cv2.resize(gray, (n, n), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:size, :size].ravel()
+    # DC 성분은 전체 밝기라서 중앙값 계산에서 제외
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def page_hash(image):
+    """페이지 이미지의 (pHash, dHash) 쌍
+
+    글자 페이지는 레이아웃이 비슷해 일반적인 8x8(64비트) 해시로는 다른 페이지와 구분되지 않으므로 16x16(256비트)을 사용
+    """
+    return phash(image), dhash(image)
+
+
+HASH_BYTES = 32  # 256비트
+
+
+def _to_bits(h):
+    return np.frombuffer(h.to_bytes(HASH_BYTES, 'big'), dtype=np.uint8)
+
+
+class HammingIndex:
+    """256비트 해시 쌍을 바이트 행렬로 보관하고 XOR + 비트 합으로 전체 거리를 한 번에 계산하는 근사 중복 색인"""
+    def __init__(self):
+        self.keys = []
+        self._rows = np.zeros((0, 2, HASH_BYTES), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, hashes):
+        self.keys.append(key)
+        row = np.stack([_to_bits(h) for h in hashes])[None]
+        self._rows = np.concatenate([self._rows, row])
+
+    def remove(self, key):
+        i = self.keys.index(key)
+        del self.keys[i]
+        self._rows = np.delete(self._rows, i, axis=0)
+
+    def search(self, hashes, max_distance):
+        """두 해시 모두 max_distance 이내인 항목 중 가장 가까운 (key, 거리) 또는 None"""
+        if not self.keys:
+            return None
+        query = np.stack([_to_bits(h) for h in hashes])
+        dist = np.unpackbits(self._rows ^ query, axis=2).sum(axis=2)  # (N, 2): pHash, dHash 거리
+        # 레이아웃이 비슷한 다른 페이지를 잘못 매칭하지 않도록 두 해시가 모두 가까워야 적중
+        ok = (dist <= max_distance).all(axis=1)
+        if not ok.any():
+            return None
+        total = np.where(ok, dist.sum(axis=1), np.iinfo(np.int64).max)
+        i = int(total.argmin())
+        return self.keys[i], int(total[i])
+
+
+class OCRCache:
+    """페이지 지각 해시로 OCR 결과를 재사용하는 캐시 (메모리 LRU + 디스크 색인)
+
+    디스크에는 해시와 이미 저장된 OCR/이미지 파일 경로만 jsonl로 남기고, 본문은 LRU에 없을 때 ocr 파일에서 읽는다.
+    max_distance: 같은 페이지로 인정하는 해시별 최대 해밍 거리 (256비트 중)
+    """
+    def __init__(self, index_path="conversation/ocr_cache.jsonl", capacity=64, max_distance=56):
+        self.index_path = index_path
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._texts = OrderedDict()
+        self._index = HammingIndex()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    key = entry['key']
+                    hashes = int(entry['phash'], 16), int(entry['dhash'], 16)
+                except (ValueError, KeyError):
+                    continue
+                if key in self._entries:
+                    self._index.remove(key)
+                self._entries[key] = entry
+                self._index.add(key, hashes)
+
+    def get(self, hashes):
+        """근사 중복 페이지의 (ocr_text, image_path, ocr_path) 또는 None"""
+        with self._lock:
+            found = self._index.search(hashes, self.max_distance)
+            if found is not None:
+                key, distance = found
+                text = self._read_text(key)
+                if text is not None:
+                    self.hits += 1
+                    entry = self._entries[key]
+                    print(f"OCR 캐시 적중 (해밍 거리 {distance}, 적중률 {self.hit_ratio():.0%})")
+                    return text, entry.get('image_path'), entry.get('ocr_path')
+            self.misses += 1
+            return None
+
+    def _read_text(self, key):
+        if key in self._texts:
+            self._texts.move_to_end(key)
+            return self._texts[key]
+        path = self._entries[key].get('ocr_path')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except (OSError, TypeError):
+            # OCR 파일이 지워졌으면 색인에서도 제외
+            self._index.remove(key)
+            del self._entries[key]
+            return None
+        self._remember(key, text)
+        return text
+
+    def _remember(self, key, text):
+        self._texts[key] = text
+        self._texts.move_to_end(key)
+        while len(self._texts) > self.capacity:
+            self._texts.popitem(last=False)
+
+    def put(self, hashes, text, image_path=None, ocr_path=None):
+        entry = {
+            'key': f"{hashes[0]:064x}{hashes[1]:064x}",
+            'phash': f"{hashes[0]:064x}",
+            'dhash': f"{hashes[1]:064x}",
+            'image_path': image_path,
+            'ocr_path': ocr_path,
+            'created': time.time(),
+        }
+        key = entry['key']
+        with self._lock:
+            if key in self._entries:
+                self._index.remove(key)
+            self._entries[key] = entry
+            self._index.add(key, hashes)
+            self._remember(key, text)
+            if ocr_path is None:
+                return
+            # ocr 파일이 있는 항목만 디스크에 남겨 재시작 후에도 재사용
+            try:
+                os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+                with open(self.index_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"OCR 캐시 저장 오류: {e}")
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,158 @@
+import json
+import os
+from statistics import median
+
+
+def _box(vertices):
+    """boundingPoly 꼭짓점 목록을 감싸는 [x1, y1, x2, y2]"""
+    xs = [v.get('x', 0) for v in vertices] or [0]
+    ys = [v.get('y', 0) for v in vertices] or [0]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _union(boxes):
+    return [min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes)]
+
+
+def _group_lines(fields):
+    """lineBreak 표시로 단어를 줄로 묶고, 표시가 전혀 없으면 세로 위치가 겹치는 단어끼리 묶음"""
+    if any(f['line_break'] for f in fields):
+        lines, current = [], []
+        for i, field in enumerate(fields):
+            current.append(i)
+            if field['line_break']:
+                lines.append(current)
+                current = []
+        if current:
+            lines.append(current)
+        return lines
+
+    lines = []
+    for i, field in enumerate(fields):
+        x1, y1, x2, y2 = field['box']
+        cy = (y1 + y2) / 2
+        last = lines[-1] if lines else None
+        if last is not None:
+            ly1, ly2 = min(fields[j]['box'][1] for j in last), max(fields[j]['box'][3] for j in last)
+            if ly1 <= cy <= ly2:
+                last.append(i)
+                continue
+        lines.append([i])
+    return lines
+
+
+def _group_blocks(lines, gap_ratio=0.8, indent_ratio=1.0):
+    """줄 간격이 평소보다 넓거나 첫 줄 들여쓰기가 있으면 새 문단(블록)으로 나눔"""
+    if not lines:
+        return []
+    heights = [ln['box'][3] - ln['box'][1] for ln in lines]
+    line_h = max(1, median(heights))
+    blocks, current = [], [0]
+    for i in range(1, len(lines)):
+        prev, cur = lines[i - 1]['box'], lines[i]['box']
+        gap = cur[1] - prev[3]
+        block_left = min(lines[j]['box'][0] for j in current)
+        new_block = (
+            gap > gap_ratio * line_h
+            or cur[1] < prev[1] - line_h  # 다음 단(column)으로 넘어감
+            or cur[0] - block_left > indent_ratio * line_h  # 첫 줄 들여쓰기
+        )
+        if new_block:
+            blocks.append(current)
+            current = []
+        current.append(i)
+    blocks.append(current)
+    return blocks
+
+
+def build_layout(data):
+    """Clova OCR V2 응답을 단어(fields) -> 줄(lines) -> 블록(blocks) 구조로 변환
+
+    각 항목은 text와 [x1, y1, x2, y2] box를 가지며 lines/blocks는 하위 항목의 인덱스 목록을 가진다.
+    text는 줄을 줄바꿈, 블록을 빈 줄로 구분한 페이지 전체 텍스트이다.
+    """
+    fields = []
+    size = None
+    for image in data.get('images', []):
+        info = image.get('convertedImageInfo') or {}
+        if size is None and info.get('width'):
+            size = [info.get('width'), info.get('height')]
+        for field in image.get('fields', []):
+            text = field.get('inferText', '').strip()
+            if not text:
+                continue
+            fields.append({
+                'text': text,
+                'box': _box(field.get('boundingPoly', {}).get('vertices', [])),
+                'conf': field.get('inferConfidence'),
+                'line_break': bool(field.get('lineBreak', False)),
+            })
+
+    lines = []
+    for idx in _group_lines(fields):
+        lines.append({
+            'text': " ".join(fields[i]['text'] for i in idx),
+            'box': _union([fields[i]['box'] for i in idx]),
+            'fields': idx,
+        })
+
+    blocks = []
+    for idx in _group_blocks(lines):
+        blocks.append({
+            'text': "\n".join(lines[i]['text'] for i in idx),
+            'box': _union([lines[i]['box'] for i in idx]),
+            'lines': idx,
+        })
+
+    return {
+        'size': size,
+        'text': "\n\n".join(b['text'] for b in blocks),
+        'fields': fields,
+        'lines': lines,
+        'blocks': blocks,
+    }
+
+
+def layout_path(ocr_path):
+    """OCR 텍스트 파일 옆에 저장되는 구조화 결과(JSON) 경로"""
+    return os.path.splitext(ocr_path)[0] + ".json"
+
+
+def load_layout(ocr_path):
+    """ocr_path에 대응하는 구조화 결과, 없으면 None"""
+    if not ocr_path:
+        return None
+    try:
+        with open(layout_path(ocr_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _bigrams(text):
+    text = "".join(text.split())
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def relevant_text(layout, question, max_chars=800):
+    """질문과 글자 바이그램이 많이 겹치는 블록만 페이지 순서대로 max_chars 안에서 골라 반환
+
+    페이지 전체가 max_chars 이하이거나 질문과 겹치는 블록이 없으면(요약 요청 등) 전체 텍스트를 반환한다.
+    """
+    blocks = layout.get('blocks', [])
+    full = layout.get('text', "")
+    if len(full) <= max_chars or len(blocks) < 2:
+        return full
+    query = _bigrams(question)
+    scores = [len(query & _bigrams(b['text'])) for b in blocks]
+    if not any(scores):
+        return full
+    chosen, total = [], 0
+    for i in sorted(range(len(blocks)), key=lambda i: -scores[i]):
+        if scores[i] == 0:
+            break
+        if chosen and total + len(blocks[i]['text']) > max_chars:
+            continue
+        chosen.append(i)
+        total += len(blocks[i]['text'])
+    return "\n\n".join(blocks[i]['text'] for i in sorted(chosen))
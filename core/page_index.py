@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+
+from core.ocr_layout import load_layout
+
+
+def tokenize(text):
+    """BM25용 토큰: 어절마다 글자 바이그램 (형태소 분석기 없이 한국어 조사/어미 변화에 강함), 한 글자 어절은 그대로"""
+    tokens = []
+    for word in (text or "").lower().split():
+        if len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def chunk_page(text, layout=None, max_chars=300):
+    """페이지를 문단(레이아웃 블록 또는 빈 줄) 단위로 나누고, 짧은 문단은 이어 붙여 max_chars 안팎의 조각으로 만듦"""
+    if layout is not None and layout.get('blocks'):
+        paragraphs = [b['text'] for b in layout['blocks']]
+    else:
+        paragraphs = (text or "").split("\n\n")
+    pieces = []
+    for paragraph in paragraphs:
+        paragraph = paragraph.strip()
+        # 너무 긴 문단은 줄 단위로 나눔
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind("\n", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            pieces.append(paragraph)
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class BM25Index:
+    """조각을 추가할 때마다 역색인을 갱신하는 BM25 색인 (재구축 없이 증분 추가)"""
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = []
+        self.postings = defaultdict(dict)
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, text, meta=None):
+        doc_id = len(self.docs)
+        counts = Counter(tokenize(text))
+        length = sum(counts.values())
+        self.docs.append({'text': text, 'meta': meta or {}, 'length': length})
+        self.total_length += length
+        for term, tf in counts.items():
+            self.postings[term][doc_id] = tf
+        return doc_id
+
+    def search(self, query, k=4, where=None, min_score=0.0, min_terms=1):
+        """(점수, doc_id) 상위 k개. where(meta)가 거짓인 조각은 제외
+
+        min_score, min_terms: 점수와 겹치는 질문 토큰 수가 이보다 작은 조각은 제외 ("설명" 한 단어만 겹치는 식의 우연한 일치 방지)
+        """
+        if not self.docs:
+            return []
+        n = len(self.docs)
+        avg_length = self.total_length / n or 1.0
+        scores = defaultdict(float)
+        matched = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if where is not None and not where(self.docs[doc_id]['meta']):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.docs[doc_id]['length'] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[doc_id] += 1
+        hits = ((s, d) for d, s in scores.items() if s >= min_score and matched[d] >= min_terms)
+        return sorted(hits, reverse=True)[:k]
+
+
+class BookIndex:
+    """한 권(book_id)의 OCR 페이지 조각 색인. 페이지 목록은 book_dir/<book_id>.jsonl에 남겨 재시작 시 다시 색인"""
+    def __init__(self, book_id, book_dir="conversation/books", chunk_chars=300):
+        self.book_id = book_id
+        # 사용자가 지은 책 이름을 파일 이름으로 쓰므로 경로 구분자 등은 바꿈
+        self.path = os.path.join(book_dir, re.sub(r'[\\/:*?"<>|]', '_', book_id) + ".jsonl")
+        self.chunk_chars = chunk_chars
+        self.index = BM25Index()
+        self.pages = {}
+        self._lock = threading.Lock()
+        os.makedirs(book_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    self._index_page(json.loads(line)['ocr_path'])
+                except (ValueError, KeyError):
+                    continue
+        print(f"책 색인 불러오기 완료: {self.book_id} ({len(self.pages)}페이지, 조각 {len(self.index)}개)")
+
+    def _index_page(self, ocr_path, text=None):
+        if ocr_path in self.pages:
+            return False
+        if text is None:
+            try:
+                with open(ocr_path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except OSError:
+                return False
+        page_no = len(self.pages) + 1
+        self.pages[ocr_path] = page_no
+        for position, chunk in enumerate(chunk_page(text, load_layout(ocr_path), self.chunk_chars)):
+            self.index.add(chunk, {'ocr_path': ocr_path, 'page': page_no, 'position': position})
+        return True
+
+    def add_page(self, ocr_path, text=None):
+        """새 페이지만 색인하고 페이지 목록에 기록 (이미 있는 페이지는 무시)"""
+        with self._lock:
+            if not self._index_page(ocr_path, text):
+                return False
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'ocr_path': ocr_path}, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"책 색인 저장 오류: {e}")
+            return True
+
+    def search(self, question, k=4, exclude_pages=None, min_score=2.0, min_terms=2):
+        """exclude_pages(지금 보고 있는 페이지) 밖에서 질문과 관련 높은 조각 최대 k개를 페이지/문단 순서로 반환"""
+        exclude = set(exclude_pages or [])
+        where = (lambda meta: meta['ocr_path'] not in exclude) if exclude else None
+        with self._lock:
+            hits = self.index.search(question, k=k, where=where, min_score=min_score, min_terms=min_terms)
+            chunks = [self.index.docs[doc_id] for _, doc_id in hits]
+        chunks.sort(key=lambda d: (d['meta']['page'], d['meta']['position']))
+        return [{'text': d['text'], **d['meta']} for d in chunks]
+
+
+class PageLibrary:
+    """book_id별 BookIndex를 필요할 때 만들어 보관"""
+    def __init__(self, book_dir="conversation/books", chunk_chars=300):
+        self.book_dir = book_dir
+        self.chunk_chars = chunk_chars
+        self.books = {}
+        self._lock = threading.Lock()
+
+    def get(self, book_id):
+        with self._lock:
+            if book_id not in self.books:
+                self.books[book_id] = BookIndex(book_id, self.book_dir, self.chunk_chars)
+            return self.books[book_id]
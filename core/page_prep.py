@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+
+def order_corners(pts):
+    """네 꼭짓점을 좌상, 우상, 우하, 좌하 순서로 정렬"""
+    pts = np.asarray(pts, dtype=np.float32).reshape(4, 2)
+    s = pts.sum(axis=1)
+    d = np.diff(pts, axis=1).ravel()
+    return np.array([pts[s.argmin()], pts[d.argmin()], pts[s.argmax()], pts[d.argmax()]], dtype=np.float32)
+
+
+def find_page_quad(image, min_area_ratio=0.3, work_width=400):
+    """이미지에서 가장 큰 밝은 사각형(페이지)의 네 꼭짓점을 찾음, 없으면 None"""
+    h, w = image.shape[:2]
+    r = min(1.0, work_width / w)
+    small = cv2.resize(image, (max(1, int(w * r)), max(1, int(h * r))), interpolation=cv2.INTER_AREA) if r < 1 else image
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    # 종이는 배경보다 밝다고 보고 Otsu 이진화 후 글자 구멍을 닫아 페이지 한 덩어리로 만듦
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((9, 9), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    contour = max(contours, key=cv2.contourArea)
+    if cv2.contourArea(contour) < min_area_ratio * small.shape[0] * small.shape[1]:
+        return None
+    hull = cv2.convexHull(contour)
+    quad = cv2.approxPolyDP(hull, 0.02 * cv2.arcLength(hull, True), True)
+    if len(quad) != 4:
+        quad = cv2.boxPoints(cv2.minAreaRect(hull))
+    return order_corners(quad) / r
+
+
+def warp_page(image, quad):
+    """페이지 사각형을 정면에서 본 직사각형으로 펼침"""
+    tl, tr, br, bl = quad
+    width = int(round(max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))))
+    height = int(round(max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))))
+    dst = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    M = cv2.getPerspectiveTransform(quad.astype(np.float32), dst)
+    return cv2.warpPerspective(image, M, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def estimate_text_height(image):
+    """어두운 글자 연결 요소 높이의 중앙값(px), 글자가 거의 없으면 None"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    h = gray.shape[0]
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    # 점/잡음과 선/그림을 제외한 글자 크기 요소만 사용
+    keep = (heights >= 4) & (heights <= 0.1 * h) & (widths <= 3 * heights)
+    if keep.sum() < 20:
+        return None
+    return float(np.median(heights[keep]))
+
+
+def prepare_page(image, target_text_height=24, min_text_height=10, rectify=True):
+    """OCR 업로드 전 페이지를 펴고 글자 높이가 [min_text_height, target_text_height] 범위가 되도록 리샘플
+
+    반환: (처리된 이미지, 정보 dict: rectified, text_height, scale)
+    """
+    info = {'rectified': False, 'text_height': None, 'scale': 1.0}
+    if rectify:
+        quad = find_page_quad(image)
+        if quad is not None:
+            image = warp_page(image, quad)
+            info['rectified'] = True
+    text_height = estimate_text_height(image)
+    info['text_height'] = text_height
+    if text_height:
+        if text_height > target_text_height:
+            scale = target_text_height / text_height
+        elif text_height < min_text_height:
+            scale = min(2.0, min_text_height / text_height)
+        else:
+            scale = 1.0
+        if abs(scale - 1.0) > 0.05:
+            h, w = image.shape[:2]
+            size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+            info['scale'] = scale
+    return image, info
@@ -0,0 +1,97 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+
+def normalize_question(question):
+    """대소문자, 띄어쓰기, 문장부호 차이를 없앤 질문 문자열 (STT 결과마다 띄어쓰기가 달라 공백도 제거)"""
+    question = unicodedata.normalize('NFKC', question or "").lower()
+    return re.sub(r'[\W_]+', '', question)
+
+
+def text_hash(text):
+    """OCR 텍스트의 공백 차이를 무시한 SHA-1 (책 내용이 없으면 빈 문자열)"""
+    if not text:
+        return ""
+    return hashlib.sha1(" ".join(text.split()).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """(정규화한 질문, OCR 텍스트 해시)를 키로 AI 응답을 SQLite에 저장하는 캐시
+
+    - ttl: 이 시간(초)이 지난 응답은 사용하지 않고 지움
+    - capacity: 최대 항목 수. 넘치면 가장 오래 사용하지 않은 항목부터 지움 (LRU)
+    - namespace: 모델/시스템 지시문이 바뀌면 예전 응답이 섞이지 않도록 키에 포함
+    """
+    def __init__(self, db_path="conversation/response_cache.db", ttl=7 * 24 * 3600, capacity=1000, namespace=""):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.capacity = capacity
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        # 질문 처리 스레드마다 호출되므로 연결 하나를 잠금으로 보호해 공유
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, question TEXT, response TEXT, created REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._db.commit()
+
+    def key(self, question, ocr_text=None):
+        raw = f"{self.namespace}\x00{normalize_question(question)}\x00{text_hash(ocr_text)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, question, ocr_text=None):
+        """저장된 응답 또는 None"""
+        key = self.key(question, ocr_text)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            print(f"응답 캐시 적중 (적중률 {self.hit_ratio():.0%}, {self.hits}/{self.hits + self.misses})")
+            return row[0]
+
+    def put(self, question, ocr_text, response):
+        key = self.key(question, ocr_text)
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, question, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, question, response, now, now)
+                )
+                self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.capacity,)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"응답 캐시 저장 오류: {e}")
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
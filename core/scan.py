@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PageStore:
+    """스캔 세션 동안 OCR이 끝난 페이지를 순서대로 보관하고 conversation/sessions/scan_<id>.json에 기록"""
+    def __init__(self, session_dir="conversation/sessions", session_id=None):
+        self.session_id = session_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.path = os.path.join(session_dir, f"scan_{self.session_id}.json")
+        os.makedirs(session_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pages = []
+
+    def add(self, page_no, text, image_path, ocr_path):
+        with self._lock:
+            self._pages.append({'page': page_no, 'text': text, 'image_path': image_path, 'ocr_path': ocr_path})
+            # 캡처 순서가 아니라 OCR 완료 순서로 들어오므로 페이지 번호로 정렬
+            self._pages.sort(key=lambda p: p['page'])
+            pages = [{k: v for k, v in p.items() if k != 'text'} for p in self._pages]
+            # 여러 OCR 작업자가 같은 임시 파일에 쓰지 않도록 기록과 교체까지 잠금 안에서 수행
+            try:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'session_id': self.session_id, 'pages': pages}, f, ensure_ascii=False, indent=4)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"페이지 저장 오류: {e}")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pages)
+
+    def snapshot(self):
+        """(페이지별로 구분한 전체 텍스트, 이미지 경로 목록, OCR 경로 목록)"""
+        with self._lock:
+            pages = list(self._pages)
+        text = "\n\n".join(f"[페이지 {p['page']}]\n{p['text']}" for p in pages)
+        return text, [p['image_path'] for p in pages], [p['ocr_path'] for p in pages]
+
+
+class ScanSession:
+    """BookDetector.scan()이 내보낸 페이지 캡처를 제한된 작업자 풀에서 동시에 OCR해 PageStore에 모음
+
+    - workers: 동시에 OCR하는 페이지 수
+    - max_pending: 대기+처리 중인 최대 페이지 수. 가득 차면 submit()이 자리가 날 때까지 기다림 (메모리 상한)
+    """
+    def __init__(self, inform_system, workers=2, max_pending=4, store=None):
+        self.inform_system = inform_system
+        self.store = store or PageStore()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan-ocr")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._next_page = 0
+
+    def submit(self, capture_info):
+        self._slots.acquire()
+        with self._cond:
+            self._next_page += 1
+            self._pending += 1
+            page_no = self._next_page
+        self._pool.submit(self._process, page_no, capture_info)
+
+    def _process(self, page_no, capture_info):
+        try:
+            ocr_text, image_path, ocr_path = self.inform_system.process_capture(capture_info)
+            if ocr_text:
+                self.store.add(page_no, ocr_text, image_path, ocr_path)
+                print(f"페이지 {page_no} OCR 완료 (누적 {len(self.store)}페이지)")
+            else:
+                print(f"페이지 {page_no} OCR 결과 없음")
+        except Exception as e:
+            print(f"페이지 {page_no} OCR 오류: {e}")
+        finally:
+            self._slots.release()
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return self._pending
+
+    def wait(self, min_pages=0, timeout=None, cancel=None):
+        """진행 중인 OCR이 모두 끝나고 min_pages 이상 모일 때까지 대기 (cancel 이벤트로 중단). 조건을 만족하면 True"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not (self._pending == 0 and len(self.store) >= min_pages):
+                if cancel is not None and cancel.is_set():
+                    break
+                remaining = 0.2 if deadline is None else min(0.2, deadline - time.monotonic())
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._pending == 0 and len(self.store) >= min_pages
+
+    def close(self):
+        self._pool.shutdown(wait=True)
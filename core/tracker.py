@@ -0,0 +1,132 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """(N,4), (M,4) xyxy 박스 배열 간 IoU 행렬 (N,M)"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def center_distance(boxes_a, boxes_b):
+    """(N,4), (M,4) xyxy 박스 배열 간 중심점 거리 행렬 (N,M)"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ca = (a[:, :2] + a[:, 2:]) / 2
+    cb = (b[:, :2] + b[:, 2:]) / 2
+    return np.linalg.norm(ca[:, None, :] - cb[None, :, :], axis=2)
+
+
+class Track:
+    """문서 한 개의 EMA 평활 박스, 최근 박스 기록, 안정 타이머"""
+    def __init__(self, track_id, box, conf, cls, now, history):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.history = deque([self.box.copy()], maxlen=history)
+        self.conf = conf
+        self.cls = cls
+        self.stable_since = now
+        self.last_seen = now
+        self.missed = 0
+        self.settled = True
+
+    def elapsed(self, now=None):
+        return (time.time() if now is None else now) - self.stable_since
+
+    def bbox(self):
+        return [int(round(v)) for v in self.box]
+
+
+class StabilityTracker:
+    """여러 문서를 동시에 추적하며 손떨림/짧은 가림에도 유지되는 안정성 타이머를 관리
+
+    - match_iou: 기존 트랙과 새 검출을 같은 문서로 매칭하는 최소 IoU
+    - iou_thres, center_thres: 최근 기록 박스가 평활 박스와 '같은 위치'로 인정되는 기준
+    - jitter_frames: 연속으로 기준을 벗어나야 움직임으로 보는 프레임 수 (그보다 짧은 흔들림은 무시)
+    - max_missed: 검출이 끊겨도 트랙과 타이머를 유지하는 시간(초)
+    """
+    def __init__(self, stability_seconds=3.0, iou_thres=0.7, center_thres=30, ema_alpha=0.5, history=10,
+                 jitter_frames=2, match_iou=0.3, max_missed=0.5):
+        self.stability_seconds = stability_seconds
+        self.iou_thres = iou_thres
+        self.center_thres = center_thres
+        self.ema_alpha = ema_alpha
+        self.history = history
+        self.jitter_frames = jitter_frames
+        self.match_iou = match_iou
+        self.max_missed = max_missed
+        self.reset()
+
+    def reset(self):
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, detections, now=None):
+        """detections: [(bbox, conf, cls), ...]. 이번 프레임에서 보인 트랙 목록을 반환"""
+        now = time.time() if now is None else now
+        boxes = np.array([d[0] for d in detections], dtype=np.float32).reshape(-1, 4)
+        matched_tracks, matched_dets = set(), set()
+
+        if self.tracks and len(boxes):
+            iou = box_iou(np.stack([t.box for t in self.tracks]), boxes)
+            # IoU가 높은 쌍부터 탐욕적으로 매칭
+            for flat in np.argsort(-iou, axis=None):
+                ti, di = np.unravel_index(flat, iou.shape)
+                if iou[ti, di] < self.match_iou:
+                    break
+                if ti in matched_tracks or di in matched_dets:
+                    continue
+                matched_tracks.add(ti)
+                matched_dets.add(di)
+                self._update_track(self.tracks[ti], detections[di], boxes[di], now)
+
+        alive = []
+        for i, track in enumerate(self.tracks):
+            if i not in matched_tracks:
+                track.missed += 1
+                if now - track.last_seen > self.max_missed:
+                    continue
+            alive.append(track)
+        for di, det in enumerate(detections):
+            if di not in matched_dets:
+                alive.append(Track(self._next_id, boxes[di], det[1], det[2], now, self.history))
+                self._next_id += 1
+        self.tracks = alive
+        return [t for t in self.tracks if t.missed == 0]
+
+    def _update_track(self, track, det, box, now):
+        track.history.append(box)
+        hist = np.stack(track.history)
+        ok = (box_iou(track.box, hist)[0] > self.iou_thres) & (center_distance(track.box, hist)[0] < self.center_thres)
+        if ok[-1]:
+            track.box = self.ema_alpha * box + (1 - self.ema_alpha) * track.box
+        elif len(ok) > self.jitter_frames and not ok[-self.jitter_frames:].any():
+            # 최근 박스가 연속으로 벗어나면 실제로 움직인 것으로 보고 타이머 재시작
+            track.box = box.copy()
+            track.history.clear()
+            track.history.append(box)
+            track.stable_since = now
+        track.settled = bool(ok[-1]) or track.stable_since == now
+        track.conf, track.cls = det[1], det[2]
+        track.last_seen = now
+        track.missed = 0
+
+    def stable_tracks(self, now=None):
+        """이번 프레임에 보였고 stability_seconds 이상 유지된 트랙을 오래된 순으로 반환"""
+        now = time.time() if now is None else now
+        stable = [t for t in self.tracks if t.missed == 0 and t.settled and t.elapsed(now) >= self.stability_seconds]
+        return sorted(stable, key=lambda t: t.stable_since)
+
+    def leading_track(self):
+        """안정 시간이 가장 긴(캡처에 가장 가까운) 보이는 트랙"""
+        visible = [t for t in self.tracks if t.missed == 0]
+        return min(visible, key=lambda t: t.stable_since) if visible else None
@@ -36,7 +36,8 @@ except (ImportError, AssertionError):
 from ultralytics.utils.plotting import Annotator, colors, save_one_box
 
 from utils import TryExcept
-from utils.dataloaders import exif_transpose, letterbox
+from utils.augmentations import LetterboxPreprocessor
+from utils.dataloaders import exif_transpose
 from utils.general import (
     LOGGER,
     ROOT,
@@ -885,9 +886,11 @@ class AutoShape(nn.Module):
                 shape1.append([int(y * g) for y in s])
                 ims[i] = im if im.data.contiguous else np.ascontiguousarray(im)  # update
             shape1 = [make_divisible(x, self.stride) for x in np.array(shape1).max(0)]  # inf shape
-            x = [letterbox(im, shape1, auto=False)[0] for im in ims]  # pad
-            x = np.ascontiguousarray(np.array(x).transpose((0, 3, 1, 2)))  # stack and BHWC to BCHW
-            x = torch.from_numpy(x).to(p.device).type_as(p) / 255  # uint8 to fp16/32
+            pre = getattr(self, "preprocess", None)
+            if pre is None or pre.device != p.device or pre.dtype != p.dtype:
+                half = p.dtype == torch.half
+                self.preprocess = LetterboxPreprocessor(auto=False, device=p.device, half=half, bgr=False)
+            x = self.preprocess(ims, new_shape=shape1)  # pad, stack, BHWC to BCHW, uint8 to fp16/32 in reused buffers
 
         with amp.autocast(autocast):
             # Inference
@@ -45,6 +45,7 @@ ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
 from ultralytics.utils.plotting import Annotator, colors, save_one_box
 
 from models.common import DetectMultiBackend
+from utils.augmentations import LetterboxPreprocessor
 from utils.dataloaders import IMG_FORMATS, VID_FORMATS, LoadImages, LoadScreenshots, LoadStreams
 from utils.general import (
     LOGGER,
@@ -117,28 +118,32 @@ def run(
     stride, names, pt = model.stride, model.names, model.pt
     imgsz = check_img_size(imgsz, s=stride)  # check image size
 
-    # Dataloader
+    # Dataloader (letterbox and tensor conversion happen in the reusable preprocessor, so loaders pass frames through)
+    passthrough = lambda x: x  # noqa: E731
     bs = 1  # batch_size
     if webcam:
         view_img = check_imshow(warn=True)
-        dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
+        dataset = LoadStreams(
+            source, img_size=imgsz, stride=stride, auto=pt, transforms=passthrough, vid_stride=vid_stride
+        )
         bs = len(dataset)
     elif screenshot:
-        dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt)
+        dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt, transforms=passthrough)
     else:
-        dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
+        dataset = LoadImages(
+            source, img_size=imgsz, stride=stride, auto=pt, transforms=passthrough, vid_stride=vid_stride
+        )
     vid_path, vid_writer = [None] * bs, [None] * bs
+    # Streams with different letterbox shapes fall back to square letterboxing so every frame shares one batch shape
+    auto = pt and getattr(dataset, "rect", True)
+    preprocess = LetterboxPreprocessor(imgsz, stride=stride, auto=auto, device=model.device, half=model.fp16)
 
     # Run inference
     model.warmup(imgsz=(1 if pt else bs, 3, *imgsz))  # warmup
     seen, windows, dt = 0, [], (Profile(device=device), Profile(device=device), Profile(device=device))
     for path, im, im0s, vid_cap, s in dataset:
         with dt[0]:
-            im = torch.from_numpy(im).to(model.device)
-            im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
-            im /= 255  # 0 - 255 to 0.0 - 1.0
-            if len(im.shape) == 3:
-                im = im[None]  # expand for batch dim
+            im = preprocess(im)  # padded resize, BGR to RGB, HWC to BCHW, uint8 to fp16/32, 0 - 255 to 0.0 - 1.0
 
         # Inference
         with dt[1]:
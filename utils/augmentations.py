@@ -152,6 +152,99 @@ def letterbox(im, new_shape=(640, 640), color=(114, 114, 114), auto=True, scaleF
     return im, ratio, (dw, dh)
 
 
+class LetterboxPreprocessor:
+    """Letterboxes HWC uint8 frames into reusable buffers and emits a normalized RGB BCHW tensor in one pass."""
+
+    def __init__(
+        self, new_shape=(640, 640), stride=32, auto=True, device="cpu", half=False, pin_memory=None, color=114, bgr=True
+    ):
+        """
+        Initializes the preprocessor; buffers are allocated lazily per output shape and reused across calls.
+
+        pin_memory defaults to True on CUDA devices so the uint8 host canvas can be copied asynchronously. Set bgr=False
+        for inputs that are already RGB (e.g. PIL images in AutoShape).
+        """
+        self.new_shape = (new_shape, new_shape) if isinstance(new_shape, int) else tuple(new_shape)
+        self.stride = stride
+        self.auto = auto
+        self.device = torch.device(device)
+        self.dtype = torch.half if half else torch.float
+        self.pin_memory = self.device.type == "cuda" if pin_memory is None else pin_memory
+        self.color = color
+        self.bgr = bgr
+        self._geometry = {}  # (input (h, w), new_shape) -> (resized (w, h), output (h, w), top, left)
+        self._buffers = {}  # (batch, output h, output w) -> [host uint8 BCHW, device uint8, device output, last layout]
+        self._resized = {}  # resized (w, h) -> reusable cv2.resize destination
+        self._copy_done = None  # CUDA event guarding the async host-to-device copy of the shared host canvas
+
+    def geometry(self, shape, new_shape=None):
+        """Returns letterbox geometry for an input (h, w), matching `letterbox()` output pixel for pixel."""
+        new_shape = self.new_shape if new_shape is None else tuple(new_shape)
+        key = shape, new_shape
+        if key not in self._geometry:
+            if len(self._geometry) >= 64:
+                self._geometry.clear()
+            r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
+            new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+            dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+            if self.auto:  # minimum rectangle
+                dw, dh = np.mod(dw, self.stride), np.mod(dh, self.stride)
+            dw, dh = dw / 2, dh / 2
+            top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+            left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+            out = (new_unpad[1] + top + bottom, new_unpad[0] + left + right)
+            self._geometry[key] = new_unpad, out, top, left
+        return self._geometry[key]
+
+    def _get_buffers(self, key):
+        """Returns cached buffers for a (batch, h, w) key, allocating on first use."""
+        if key not in self._buffers:
+            if len(self._buffers) >= 8:  # bound memory when input shapes keep changing (e.g. AutoShape)
+                self._buffers.clear()
+                self._resized.clear()
+            host = torch.empty((key[0], 3, *key[1:]), dtype=torch.uint8)
+            if self.pin_memory:
+                host = host.pin_memory()
+            dev = host if self.device.type == "cpu" else torch.empty_like(host, device=self.device)
+            out = torch.empty(host.shape, dtype=self.dtype, device=self.device)
+            self._buffers[key] = [host, dev, out, None]
+        return self._buffers[key]
+
+    def __call__(self, ims, new_shape=None):
+        """
+        Preprocesses one HWC image, a BHWC array or a list of images into a (B, 3, H, W) RGB tensor in [0, 1].
+
+        The returned tensor is reused by the next call; consume (or clone) it before calling again.
+        """
+        if isinstance(ims, np.ndarray) and ims.ndim == 3:
+            ims = [ims]
+        geoms = [self.geometry(im.shape[:2], new_shape) for im in ims]
+        out_shape = geoms[0][1]
+        assert all(g[1] == out_shape for g in geoms), "LetterboxPreprocessor batch images must share an output shape"
+        buffers = self._get_buffers((len(ims), *out_shape))
+        host, dev, out, layout = buffers
+        if self._copy_done is not None:
+            self._copy_done.synchronize()  # previous async copy must finish before the canvas is overwritten
+        canvas = host.numpy()  # uint8 BCHW, shares memory with the (pinned) host tensor
+        if layout != geoms:  # padding only has to be painted when the letterbox layout changes
+            canvas.fill(self.color)
+            buffers[3] = geoms
+        order = (2, 1, 0) if self.bgr else (0, 1, 2)
+        for i, (im, (new_unpad, _, top, left)) in enumerate(zip(ims, geoms)):
+            if im.shape[1::-1] != new_unpad:
+                im = cv2.resize(im, new_unpad, dst=self._resized.get(new_unpad), interpolation=cv2.INTER_LINEAR)
+                self._resized[new_unpad] = im
+            # HWC to CHW and BGR to RGB in a single pass, written straight into the padded canvas planes
+            cv2.split(im, [canvas[i, c, top : top + new_unpad[1], left : left + new_unpad[0]] for c in order])
+        if dev is not host:
+            dev.copy_(host, non_blocking=self.pin_memory)  # upload uint8 (4x smaller than float)
+            if self.pin_memory:
+                self._copy_done = torch.cuda.Event()
+                self._copy_done.record()
+        torch.mul(dev, 1 / 255.0, out=out)  # uint8 to fp16/32, 0-255 to 0.0-1.0
+        return out
+
+
 def random_perspective(
     im, targets=(), segments=(), degrees=10, translate=0.1, scale=0.1, shear=10, perspective=0.0, border=(0, 0)
 ):
@@ -513,7 +513,8 @@ class LoadStreams:
 
         im0 = self.imgs.copy()
         if self.transforms:
-            im = np.stack([self.transforms(x) for x in im0])  # transforms
+            im = [self.transforms(x) for x in im0]  # transforms
+            im = np.stack(im) if len({x.shape for x in im}) == 1 else im  # list if stream shapes differ
         else:
             im = np.stack([letterbox(x, self.img_size, stride=self.stride, auto=self.auto)[0] for x in im0])  # resize
             im = im[..., ::-1].transpose((0, 3, 1, 2))  # BGR to RGB, BHWC to BCHW
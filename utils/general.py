@@ -1121,6 +1121,47 @@ def non_max_suppression(
     return output
 
 
+def single_class_top_nms(prediction, cls_index, conf_thres=0.25, iou_thres=0.45, max_det=1):
+    """
+    Fast NMS for a single class of interest; same (n,6) [xyxy, conf, cls] output format as `non_max_suppression()`.
+
+    Scores only the `cls_index` column (obj_conf * cls_conf), keeps boxes whose best class is `cls_index`, and runs
+    torchvision NMS only when the surviving candidates actually overlap. With max_det=1 the argmax is returned directly,
+    since NMS always keeps the highest-scoring box.
+    """
+    if isinstance(prediction, (list, tuple)):  # YOLOv5 model in validation model, output = (inference_out, loss_out)
+        prediction = prediction[0]  # select only inference output
+
+    nc = prediction.shape[2] - 5  # number of classes
+    output = [torch.zeros((0, 6), device=prediction.device)] * prediction.shape[0]
+    for xi, x in enumerate(prediction):  # image index, image inference
+        x = x[x[:, 4] > conf_thres]  # objectness prefilter, conf = obj * cls can only be lower
+        if not x.shape[0]:
+            continue
+        if nc > 1:
+            x = x[x[:, 5:].argmax(1) == cls_index]  # box must be assigned to cls_index, as in the general path
+        scores = x[:, 4] * x[:, 5 + cls_index]
+        keep = scores > conf_thres
+        x, scores = x[keep], scores[keep]
+        n = x.shape[0]
+        if not n:
+            continue
+
+        if max_det == 1 or n == 1:
+            i = scores.argmax().view(1)
+        else:
+            i = scores.argsort(descending=True)
+            boxes = xywh2xyxy(x[i, :4])
+            # pairwise overlap check is cheap for a handful of candidates; otherwise go straight to NMS
+            if n > 64 or (box_iou(boxes, boxes).triu_(diagonal=1) > iou_thres).any():
+                i = i[torchvision.ops.nms(boxes, scores[i], iou_thres)]
+            i = i[:max_det]
+        cls = torch.full((len(i), 1), cls_index, device=x.device, dtype=x.dtype)
+        output[xi] = torch.cat((xywh2xyxy(x[i, :4]), scores[i, None], cls), 1)
+
+    return output
+
+
 def strip_optimizer(f="best.pt", s=""):
     """
     Strips optimizer and optionally saves checkpoint to finalize training; arguments are file path 'f' and save path